@@ -0,0 +1,241 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, asynccontextmanager
+
+from telemetry import get_logger, gauge, histogram, counter
+
+logger = get_logger("admission")
+
+
+# -------------------------------
+# Admission settings
+# -------------------------------
+MAX_PENDING = 16          # images queued or running; requests beyond get 429
+CPU_SLOTS = 2             # concurrent YOLO / CNN stages
+SD_SLOTS = 4              # concurrent Stable Diffusion calls (threaded server)
+
+CLIENT_RATE = None        # requests per second per client; None disables the bucket
+CLIENT_BURST = 5
+MAX_CLIENTS = 10000       # token buckets kept before the least recent is dropped
+
+DEFAULT_REQUEST_SECONDS = 30   # Retry-After estimate before any request has finished
+RETRY_AFTER_MAX = 120
+DURATION_EWMA_ALPHA = 0.2
+
+PENDING = gauge(
+    "wastetoart_admission_pending", "Requests admitted and not yet finished"
+)
+SLOTS_IN_USE = gauge(
+    "wastetoart_admission_slots_in_use", "Busy concurrency slots per stage", ["stage"]
+)
+SLOT_WAIT_SECONDS = histogram(
+    "wastetoart_admission_slot_wait_seconds", "Time spent waiting for a stage slot", ["stage"]
+)
+REJECTIONS = counter(
+    "wastetoart_admission_rejections_total", "Requests turned away with 429", ["reason"]
+)
+
+
+class AdmissionRejected(Exception):
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Takes one token; returns 0, or the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """
+    Bounds how much work the server takes on.
+
+    admit() counts a request against MAX_PENDING (and the client's token
+    bucket) and fails fast with AdmissionRejected when either is spent.
+    Admitted requests then queue on per-stage slots, so CPU inference and
+    SD generation are limited independently.
+    """
+
+    def __init__(
+        self,
+        max_pending=MAX_PENDING,
+        cpu_slots=CPU_SLOTS,
+        sd_slots=SD_SLOTS,
+        client_rate=CLIENT_RATE,
+        client_burst=CLIENT_BURST
+    ):
+        self.max_pending = max_pending
+        self.limits = {"cpu": cpu_slots, "sd": sd_slots}
+        self.slots = {stage: threading.BoundedSemaphore(n) for stage, n in self.limits.items()}
+        self.async_slots = {}   # asyncio semaphores, created in the server's loop
+        self.in_use = {stage: 0 for stage in self.limits}
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.buckets = OrderedDict()
+        self.pending = 0
+        self.avg_seconds = None
+        self.rejections = {"queue_full": 0, "rate_limited": 0}
+        self.lock = threading.Lock()
+
+    def configure(self, max_pending=None, **limits):
+        """
+        Resizes the pending limit and stage slots, e.g. configure(sd=32);
+        call before serving starts.
+        """
+        with self.lock:
+            if max_pending is not None:
+                self.max_pending = max_pending
+            for stage, limit in limits.items():
+                self.limits[stage] = limit
+                self.slots[stage] = threading.BoundedSemaphore(limit)
+                self.async_slots.pop(stage, None)
+
+    # -------------------------------
+    # Request admission
+    # -------------------------------
+    def acquire(self, client_id=None, units=1):
+        """units: pending slots taken, one per image (batches take several)."""
+        with self.lock:
+            if self.pending + units > self.max_pending:
+                self._reject("queue_full", self._queue_retry_after())
+
+            if self.client_rate and client_id is not None:
+                wait = self._bucket(client_id).take()
+                if wait:
+                    self._reject("rate_limited", wait)
+
+            self.pending += units
+            PENDING.set(self.pending)
+
+    def release(self, elapsed=None, units=1):
+        with self.lock:
+            self.pending -= units
+            PENDING.set(self.pending)
+
+            if elapsed is not None:
+                if self.avg_seconds is None:
+                    self.avg_seconds = elapsed
+                else:
+                    self.avg_seconds += DURATION_EWMA_ALPHA * (elapsed - self.avg_seconds)
+
+    @contextmanager
+    def admit(self, client_id=None, units=1):
+        self.acquire(client_id, units)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start, units)
+
+    def admitted(self, fn, client_id=None):
+        """
+        Admits now and returns fn wrapped to release once it has run;
+        for work handed to the job queue.
+        """
+        self.acquire(client_id)
+        start = time.monotonic()
+
+        def run(*args, **kwargs):
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.release(time.monotonic() - start)
+
+        return run
+
+    def _reject(self, reason, retry_after):
+        retry_after = min(RETRY_AFTER_MAX, max(1, math.ceil(retry_after)))
+        self.rejections[reason] += 1
+        REJECTIONS.inc(reason=reason)
+        logger.warning("🚦 Rejected request (%s), retry after %ds", reason, retry_after)
+        raise AdmissionRejected(reason, retry_after)
+
+    def _queue_retry_after(self):
+        avg = self.avg_seconds or DEFAULT_REQUEST_SECONDS
+        return avg * self.pending / max(1, self.limits["sd"])
+
+    def _bucket(self, client_id):
+        bucket = self.buckets.get(client_id)
+        if bucket is None:
+            bucket = self.buckets[client_id] = TokenBucket(self.client_rate, self.client_burst)
+            if len(self.buckets) > MAX_CLIENTS:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(client_id)
+        return bucket
+
+    # -------------------------------
+    # Stage slots
+    # -------------------------------
+    @contextmanager
+    def slot(self, stage):
+        semaphore = self.slots[stage]
+        start = time.perf_counter()
+        semaphore.acquire()
+        SLOT_WAIT_SECONDS.observe(time.perf_counter() - start, stage=stage)
+        self._slot_taken(stage, 1)
+        try:
+            yield
+        finally:
+            self._slot_taken(stage, -1)
+            semaphore.release()
+
+    @asynccontextmanager
+    async def async_slot(self, stage):
+        """slot() for coroutines; waiting does not block the event loop."""
+        semaphore = self.async_slots.get(stage)
+        if semaphore is None:
+            semaphore = self.async_slots[stage] = asyncio.Semaphore(self.limits[stage])
+
+        start = time.perf_counter()
+        async with semaphore:
+            SLOT_WAIT_SECONDS.observe(time.perf_counter() - start, stage=stage)
+            self._slot_taken(stage, 1)
+            try:
+                yield
+            finally:
+                self._slot_taken(stage, -1)
+
+    def _slot_taken(self, stage, delta):
+        with self.lock:
+            self.in_use[stage] += delta
+        SLOTS_IN_USE.inc(delta, stage=stage)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "slots": {
+                    stage: {"limit": limit, "in_use": self.in_use[stage]}
+                    for stage, limit in self.limits.items()
+                },
+                "rejections": dict(self.rejections),
+                "avg_request_seconds": self.avg_seconds,
+                "client_rate": self.client_rate,
+                "clients_tracked": len(self.buckets)
+            }
+
+
+admission = AdmissionController()
@@ -0,0 +1,166 @@
+"""
+Micro-benchmark for prompt building.
+
+Compares the compiled / memoized builder against a copy of the previous
+implementation on large detection lists and long user notes, and checks
+that both produce byte-identical prompts.
+
+    python backend/benchmarks/bench_prompt.py --detections 500 --rounds 2000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt import prompt_builder as pb
+
+
+# -------------------------------
+# Reference: previous builder (maps rebuilt and one re.sub per keyword)
+# -------------------------------
+def reference_sanitize(text):
+    if not text:
+        return ""
+
+    text = text.lower().strip()[:pb.MAX_USER_TEXT_LEN]
+
+    for word in pb.FORBIDDEN_KEYWORDS:
+        text = re.sub(rf"\b{word}\b", "", text)
+
+    return text.strip()
+
+
+def reference_build_prompt(detections, style=None, mood=None, user_notes=None, art_target_override=None):
+    materials = [d["class"] for d in detections if d.get("biodeg_label") == "Non-Biodegradable"]
+    if not materials:
+        raise ValueError("No recyclable materials found")
+
+    counts = Counter(materials)
+    total_objects = sum(counts.values())
+
+    final_target = art_target_override if art_target_override else pb.suggest_art_target(counts)
+
+    material_parts = []
+    for mat, count in counts.items():
+        material_parts.append(f"a {mat}" if count == 1 else f"{count} {mat}s")
+    materials_text = ", ".join(material_parts)
+
+    composition_text = pb.choose_composition(total_objects)
+    orientation_hint = pb.extract_orientation_hint(detections)
+    shape_text = ", ".join(pb.OBJECT_SHAPE_MAP[m] for m in counts if m in pb.OBJECT_SHAPE_MAP)
+    texture_text = ", ".join(pb.MATERIAL_TEXTURE_MAP[m] for m in counts if m in pb.MATERIAL_TEXTURE_MAP)
+    lamp_glow_hint = "soft warm internal light glow" if "lamp" in final_target.lower() else ""
+
+    base_prompt = (
+        f"A recycled {final_target} created from {materials_text}, "
+        f"{composition_text}, "
+        f"{orientation_hint}, "
+        f"{shape_text}, "
+        f"{texture_text}, "
+        f"{lamp_glow_hint}, "
+        f"visibly handcrafted structure, carefully assembled recycled components, "
+        f"realistic material behavior, believable physical construction, "
+        f"artistic handcrafted recycled design"
+    )
+
+    STYLE_MAP = dict(pb.STYLE_MAP)
+    MOOD_MAP = dict(pb.MOOD_MAP)
+
+    final_prompt = ", ".join(
+        p for p in [
+            base_prompt,
+            STYLE_MAP.get(style, ""),
+            MOOD_MAP.get(mood, ""),
+            reference_sanitize(user_notes),
+            "high detail, clean composition, professional artwork, visibly transformed into recycled art, not a photograph"
+        ] if p
+    )
+
+    negative_prompt = (
+        "people, faces, animals, realistic photo, unchanged object, messy composition, "
+        "low quality, blurry, distorted, watermark, text"
+    )
+    return final_prompt, negative_prompt
+
+
+# -------------------------------
+# Workload
+# -------------------------------
+CLASSES = ["bottle", "cup", "can", "paper", "cardboard", "plastic", "glass"]
+NOTE_WORDS = ["bright", "lamp", "car", "space", "recycled", "bottle", "gold", "warm", "war", "calm"]
+
+
+def make_detections(rng, count):
+    detections = []
+    for _ in range(count):
+        x1, y1 = rng.randint(0, 800), rng.randint(0, 800)
+        detections.append({
+            "class": rng.choice(CLASSES),
+            "biodeg_label": rng.choice(["Non-Biodegradable", "Non-Biodegradable", "Biodegradable"]),
+            "bbox": [x1, y1, x1 + rng.randint(10, 300), y1 + rng.randint(10, 300)]
+        })
+    return detections
+
+
+def make_notes(rng, words):
+    return " ".join(rng.choice(NOTE_WORDS) for _ in range(words))
+
+
+def bench(fn, cases, rounds):
+    start = time.perf_counter()
+    for i in range(rounds):
+        fn(*cases[i % len(cases)])
+    return rounds / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prompt builder micro-benchmark")
+    parser.add_argument("--detections", type=int, default=500)
+    parser.add_argument("--note-words", type=int, default=200)
+    parser.add_argument("--cases", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cases = [
+        (
+            make_detections(rng, args.detections),
+            rng.choice([None, *pb.STYLE_MAP]),
+            rng.choice([None, *pb.MOOD_MAP]),
+            make_notes(rng, args.note_words),
+            rng.choice([None, "", "lamp sculpture", "bird feeder"])
+        )
+        for _ in range(args.cases)
+    ]
+
+    # Byte-identical output check
+    for detections, style, mood, notes, target in cases:
+        expected = reference_build_prompt(detections, style, mood, notes, target)
+        actual = pb.build_prompt(detections, 0, 0, style, mood, notes, target)
+        if expected != actual:
+            sys.exit("❌ Output differs from the reference builder")
+
+        if reference_sanitize(notes) != pb.sanitize_user_text(notes):
+            sys.exit("❌ sanitize_user_text differs from the reference")
+
+    print(f"✅ {len(cases)} cases byte-identical")
+
+    ref_rate = bench(reference_build_prompt, [(d, s, m, n, t) for d, s, m, n, t in cases], args.rounds)
+    new_rate = bench(pb.build_prompt, [(d, 0, 0, s, m, n, t) for d, s, m, n, t in cases], args.rounds)
+
+    notes = [(n,) for _, _, _, n, _ in cases]
+    ref_sanitize = bench(reference_sanitize, notes, args.rounds * 10)
+    new_sanitize = bench(pb.sanitize_user_text, notes, args.rounds * 10)
+
+    print(f"\n📊 build_prompt ({args.detections} detections, {args.note_words}-word notes)")
+    print(f" - reference  {ref_rate:10.0f} prompts/s")
+    print(f" - compiled   {new_rate:10.0f} prompts/s   ({new_rate / ref_rate:.1f}x)")
+    print("📊 sanitize_user_text")
+    print(f" - reference  {ref_sanitize:10.0f} calls/s")
+    print(f" - compiled   {new_sanitize:10.0f} calls/s   ({new_sanitize / ref_sanitize:.1f}x)")
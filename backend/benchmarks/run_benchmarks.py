@@ -0,0 +1,252 @@
+"""
+Per-stage benchmark for the waste-to-art pipeline.
+
+Runs every image in sample_inputs/ through detection, filtering,
+classification, prompt building and generation, and writes latency
+percentiles and peak memory per stage to JSON.
+
+    python backend/benchmarks/run_benchmarks.py --stub --iterations 5
+    python backend/benchmarks/run_benchmarks.py --stub --compare old.json
+    python backend/benchmarks/run_benchmarks.py --stub --no-fast-path   # every label from the CNN
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(BACKEND_DIR)
+sys.path.append(BACKEND_DIR)
+
+STAGES = ["detection", "filtering", "classification", "prompt", "generation"]
+
+
+# -------------------------------
+# Setup
+# -------------------------------
+def start_stub_sd():
+    import threading
+    from generation import generate_art as ga
+    from generation.sd_client import SDClient
+    from generation.sd_stub import serve
+
+    server = serve(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    ga.sd_client = SDClient(f"http://127.0.0.1:{server.server_address[1]}")
+    return server
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+# -------------------------------
+# One pass over one image
+# -------------------------------
+def run_stages(path, output_dir, record, label_sources=None):
+    from detection.detect import run_detection
+    from prompt.prompt_builder import build_prompt
+    from generation.generate_art import generate_art
+    from ingest import ingest_path
+    from pipeline import new_reasoning, filter_detections, classify_detections, label_detections
+
+    ingested = ingest_path(path)
+    reasoning = new_reasoning()
+
+    raw = record("detection", run_detection, ingested.image)
+
+    detections, error = record("filtering", filter_detections, raw, reasoning)
+    if error:
+        return
+
+    def classify():
+        labels, sources = classify_detections(detections)
+        if label_sources is not None:
+            for source in sources:
+                label_sources[source] = label_sources.get(source, 0) + 1
+        return label_detections(detections, labels, reasoning, sources)
+
+    if record("classification", classify):
+        return
+
+    prompt_text, negative_prompt = record(
+        "prompt", build_prompt,
+        detections=detections,
+        biodegradable_count=reasoning["biodegradable"],
+        non_biodegradable_count=reasoning["non_biodegradable"]
+    )
+
+    output_path = os.path.join(output_dir, f"{uuid.uuid4().hex}.png")
+    try:
+        record("generation", generate_art, prompt_text, negative_prompt, output_path, ingested.image)
+    except Exception as e:
+        print("⚠ Generation failed:", str(e))
+
+
+# -------------------------------
+# Measurement
+# -------------------------------
+def measure_latency(images, iterations, output_dir):
+    """Returns (samples per stage, label counts per source: yolo / cnn)."""
+    samples = {stage: [] for stage in STAGES}
+    label_sources = {"yolo": 0, "cnn": 0}
+
+    def record(stage, fn, *args, **kwargs):
+        start = time.perf_counter()
+        out = fn(*args, **kwargs)
+        samples[stage].append((time.perf_counter() - start) * 1000.0)
+        return out
+
+    for _ in range(iterations):
+        for path in images:
+            run_stages(path, output_dir, record, label_sources)
+
+    return samples, label_sources
+
+
+def measure_memory(images, output_dir):
+    # Separate pass: tracemalloc would distort the latency numbers
+    peaks = {stage: 0 for stage in STAGES}
+
+    def record(stage, fn, *args, **kwargs):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        out = fn(*args, **kwargs)
+        peaks[stage] = max(peaks[stage], tracemalloc.get_traced_memory()[1] - before)
+        return out
+
+    tracemalloc.start()
+    try:
+        for path in images:
+            run_stages(path, output_dir, record)
+    finally:
+        tracemalloc.stop()
+
+    return peaks
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples, peaks):
+    summary = {}
+    for stage in STAGES:
+        values = samples[stage]
+        if not values:
+            summary[stage] = {"count": 0}
+            continue
+        summary[stage] = {
+            "count": len(values),
+            "mean_ms": sum(values) / len(values),
+            "p50_ms": percentile(values, 50),
+            "p90_ms": percentile(values, 90),
+            "p99_ms": percentile(values, 99),
+            "max_ms": max(values),
+            "peak_kb": peaks[stage] / 1024.0
+        }
+    return summary
+
+
+def compare(current, baseline, threshold):
+    """Returns a list of regressions (p50 slower than baseline * threshold)."""
+    regressions = []
+    for stage, stats in current["stages"].items():
+        old = baseline.get("stages", {}).get(stage, {})
+        if "p50_ms" not in stats or not old.get("p50_ms"):
+            continue
+        ratio = stats["p50_ms"] / old["p50_ms"]
+        if ratio > threshold:
+            regressions.append({"stage": stage, "ratio": ratio})
+    return regressions
+
+
+# -------------------------------
+# CLI
+# -------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage pipeline benchmark")
+    parser.add_argument("--images", default=os.path.join(PROJECT_ROOT, "sample_inputs", "*.jpg"))
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--stub", action="store_true", help="use deterministic stub models and SD")
+    parser.add_argument("--no-fast-path", action="store_true",
+                        help="label every detection with the CNN (no YOLO-class shortcut)")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args()
+
+    images = sorted(glob.glob(args.images))
+    if not images:
+        sys.exit(f"No images match {args.images}")
+
+    if args.no_fast_path:
+        from classification import classify
+        classify.YOLO_FAST_PATH = False
+
+    sd_server = None
+    if args.stub:
+        from benchmarks.stubs import install_model_stubs
+        install_model_stubs()
+        sd_server = start_stub_sd()
+
+    output_dir = tempfile.mkdtemp(prefix="bench_output_")
+
+    # Warm-up pass so model loading is not counted
+    measure_latency(images[:1], 1, output_dir)
+
+    samples, label_sources = measure_latency(images, args.iterations, output_dir)
+    peaks = measure_memory(images, output_dir)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "mode": "stub" if args.stub else "real",
+            "images": len(images),
+            "iterations": args.iterations,
+            "fast_path": not args.no_fast_path,
+            "python": platform.python_version()
+        },
+        "stages": summarize(samples, peaks),
+        "label_sources": label_sources
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n📊 Results written to {args.output}")
+    for stage, stats in report["stages"].items():
+        if stats.get("count"):
+            print(f" - {stage:<15} p50 {stats['p50_ms']:8.2f} ms   p90 {stats['p90_ms']:8.2f} ms   peak {stats['peak_kb']:9.1f} KB")
+    print(f"   labels: {label_sources['yolo']} from YOLO, {label_sources['cnn']} from the CNN")
+
+    if sd_server:
+        sd_server.shutdown()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for r in regressions:
+            print(f"❌ Regression in {r['stage']}: {r['ratio']:.2f}x slower than baseline")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from storage import STORAGE_ROOT
+
+
+# -------------------------------
+# Result cache settings
+# -------------------------------
+RESULT_CACHE_DIR = os.path.join(STORAGE_ROOT, "cache", "results")
+
+MAX_ENTRIES = 2000
+MAX_BYTES = 64 * 1024 * 1024
+
+# Bump when the pipeline output changes so old entries stop matching
+CACHE_VERSION = 5
+
+
+class ResultCache:
+    """
+    Content-addressed, on-disk cache of pipeline results.
+
+    Each entry is one JSON file named after its key. Recency is kept in
+    memory and mirrored to the file mtime, so LRU order survives restarts.
+    """
+
+    def __init__(self, cache_dir=RESULT_CACHE_DIR, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.entries = OrderedDict()   # key -> size in bytes (oldest first)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    # -------------------------------
+    # Keys
+    # -------------------------------
+    def make_key(self, image_hash, options):
+        payload = json.dumps(
+            {"version": CACHE_VERSION, "image": image_hash, "options": options},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # -------------------------------
+    # Lookup / store
+    # -------------------------------
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    result = json.load(f)
+            except (OSError, ValueError):
+                self._drop(key)
+                self.misses += 1
+                return None
+
+            # Generated artwork was removed -> entry is stale
+            image_path = result.get("image_path")
+            if image_path and not os.path.exists(image_path):
+                self._drop(key)
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            os.utime(path, None)
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        data = json.dumps(result).encode("utf-8")
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+
+        with self.lock:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+            if key in self.entries:
+                self.total_bytes -= self.entries[key]
+            self.entries[key] = len(data)
+            self.entries.move_to_end(key)
+            self.total_bytes += len(data)
+
+            self._evict()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0
+            }
+
+    # -------------------------------
+    # Internals
+    # -------------------------------
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_index(self):
+        found = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            st = os.stat(os.path.join(self.cache_dir, name))
+            found.append((st.st_mtime, name[:-len(".json")], st.st_size))
+
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total_bytes += size
+
+        self._evict()
+
+    def _drop(self, key):
+        self.total_bytes -= self.entries.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self.entries and (
+            len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes
+        ):
+            oldest = next(iter(self.entries))
+            self._drop(oldest)
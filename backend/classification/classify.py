@@ -1,32 +1,192 @@
-import tensorflow as tf
 import numpy as np
 import os
-from tensorflow.keras.preprocessing import image
+import cv2
+import model_client
+from registry import registry
+from telemetry import get_logger, timed, MODEL_SECONDS, CLASSIFIER_BATCH_SIZE, LABEL_SOURCES
+from detection.detect import ORGANIC_CLASSES, NONBIO_CLASSES
+
+logger = get_logger("classify")
 
 # ---------------------------------------------------------
-# Load model once at startup (best performance)
+# Model is loaded once, on first use (or by server warm-up)
 # ---------------------------------------------------------
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "biowaste_classifier.keras")
-model = tf.keras.models.load_model(MODEL_PATH)
+TFLITE_PATH = os.path.join(os.path.dirname(__file__), "biowaste_classifier_int8.tflite")
+
+# "keras" (full precision) or "tflite" (int8, made by export_classifier.py).
+# The Keras model is used whenever the TFLite one cannot be loaded.
+CLASSIFIER_BACKEND = os.environ.get("WASTETOART_CLASSIFIER_BACKEND", "keras")
+
+# Largest number of crops sent through the CNN in one predict call
+MAX_BATCH_SIZE = 32
+
+# Take the label straight from the YOLO class when it maps to exactly one
+# side and the detection is confident enough; otherwise ask the CNN.
+YOLO_FAST_PATH = True
+YOLO_FAST_PATH_CONF = 0.60
+
+
+def _load_keras():
+    import tensorflow as tf
+    return tf.keras.models.load_model(MODEL_PATH)
+
+
+def _load_tflite():
+    from classification.tflite_backend import TFLiteClassifier
+    return TFLiteClassifier(TFLITE_PATH)
+
+
+def _load_classifier():
+    # Shared model server configured: no TensorFlow in this process
+    if model_client.MODEL_SERVER:
+        return model_client.remote_classifier()
+
+    model = None
+
+    if CLASSIFIER_BACKEND == "tflite":
+        try:
+            model = _load_tflite()
+            logger.info("Using TFLite classifier: %s", TFLITE_PATH)
+        except Exception as e:
+            logger.warning("TFLite classifier unavailable (%s); falling back to Keras", str(e))
+
+    if model is None:
+        model = _load_keras()
+
+    # Warm-up prediction (avoids first-call delay)
+    _dummy = np.zeros((1, 224, 224, 3), dtype=np.float32)
+    model.predict(_dummy, verbose=0)
+    return model
+
+
+registry.register("classifier", _load_classifier)
+
+
+# ---------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------
+def _load_crop(crop):
+    # In-memory crop from detection (BGR NumPy array)
+    if isinstance(crop, np.ndarray):
+        if crop.size == 0:
+            raise ValueError("empty crop")
+        rgb = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+        # INTER_NEAREST_EXACT samples the same pixels as PIL's NEAREST, which
+        # keras load_img uses (plain INTER_NEAREST is off by up to a pixel)
+        resized = cv2.resize(rgb, (224, 224), interpolation=cv2.INTER_NEAREST_EXACT)
+        return resized.astype(np.float32) / 255.0
+
+    # Crop saved on disk
+    from tensorflow.keras.preprocessing import image
+
+    img = image.load_img(crop, target_size=(224, 224))
+    return image.img_to_array(img) / 255.0
+
+
+def _describe(crop):
+    if isinstance(crop, np.ndarray):
+        return f"<array {crop.shape}>"
+    return crop
+
 
-# Warm-up prediction (avoids first-call delay)
-_dummy = np.zeros((1, 224, 224, 3), dtype=np.float32)
-model.predict(_dummy)
+def _to_label(prediction):
+    return "Biodegradable" if prediction < 0.5 else "Non-Biodegradable"
+
+
+# ---------------------------------------------------------
+# Batched prediction (one model call per chunk of crops)
+# ---------------------------------------------------------
+def predict_classes(batch, max_batch_size=None):
+    """
+    batch: list of crops, each a BGR NumPy array or an image path
+    Returns one label per crop, in the same order.
+    Crops that fail to load are labelled "Unknown".
+    """
+    max_batch_size = max_batch_size or MAX_BATCH_SIZE
+    labels = ["Unknown"] * len(batch)
+
+    arrays = []
+    indices = []
+    for i, crop in enumerate(batch):
+        try:
+            arrays.append(_load_crop(crop))
+            indices.append(i)
+        except Exception as e:
+            logger.error("Failed to classify image %s: %s", _describe(crop), str(e))
+
+    if not arrays:
+        return labels
+
+    model = registry.get("classifier")
+
+    for start in range(0, len(arrays), max_batch_size):
+        chunk = np.stack(arrays[start:start + max_batch_size])
+        CLASSIFIER_BATCH_SIZE.observe(len(chunk))
+
+        with timed(MODEL_SECONDS, model="classifier"):
+            predictions = model.predict(chunk, verbose=0)[:, 0]
+
+        for i, prediction in zip(indices[start:start + max_batch_size], predictions):
+            labels[i] = _to_label(prediction)
+
+    return labels
 
 
 # ---------------------------------------------------------
 # Main prediction function used by pipeline
 # ---------------------------------------------------------
-def predict_class(img_path):
-    try:
-        img = image.load_img(img_path, target_size=(224, 224))
-        img_array = image.img_to_array(img)
-        img_array = np.expand_dims(img_array, axis=0) / 255.0
+def predict_class(crop):
+    return predict_classes([crop])[0]
+
+
+# ---------------------------------------------------------
+# YOLO-class fast path
+# ---------------------------------------------------------
+def yolo_label(yolo_cls):
+    """Label implied by the YOLO class, or None when it is ambiguous."""
+    cls = (yolo_cls or "").lower()
+    organic = cls in ORGANIC_CLASSES
+    nonbio = cls in NONBIO_CLASSES
+
+    if organic == nonbio:
+        return None
+    return "Biodegradable" if organic else "Non-Biodegradable"
+
+
+def classify_with_yolo_mapping(items, prefer_yolo=True, min_conf=None):
+    """
+    items: list of (yolo_cls, crop, conf)
+    Returns (labels, sources); source is "yolo" or "cnn" per item.
+    Only the items that miss the fast path are sent to the CNN (one batch).
+    """
+    min_conf = YOLO_FAST_PATH_CONF if min_conf is None else min_conf
+    use_fast_path = prefer_yolo and YOLO_FAST_PATH
+
+    labels = [None] * len(items)
+    sources = ["cnn"] * len(items)
+    pending = []
+
+    for i, (yolo_cls, crop, conf) in enumerate(items):
+        label = yolo_label(yolo_cls) if use_fast_path else None
+
+        if label is not None and conf is not None and conf >= min_conf:
+            labels[i] = label
+            sources[i] = "yolo"
+        else:
+            pending.append(i)
+
+    if pending:
+        cnn_labels = predict_classes([items[i][1] for i in pending])
+        for i, label in zip(pending, cnn_labels):
+            labels[i] = label
+
+    LABEL_SOURCES.inc(len(items) - len(pending), source="yolo")
+    LABEL_SOURCES.inc(len(pending), source="cnn")
+
+    return labels, sources
 
-        prediction = model.predict(img_array, verbose=0)[0][0]
-        label = "Biodegradable" if prediction < 0.5 else "Non-Biodegradable"
-        return label
 
-    except Exception as e:
-        print(f"[ERROR] Failed to classify image {img_path}: {str(e)}")
-        return "Unknown"
+def infer_with_yolo_mapping(yolo_cls, crop, prefer_yolo=True, conf=None):
+    labels, sources = classify_with_yolo_mapping([(yolo_cls, crop, conf)], prefer_yolo)
+    return labels[0], sources[0]
@@ -0,0 +1,95 @@
+"""
+Accuracy parity and latency check: Keras vs quantized TFLite classifier.
+
+Uses the same validation split as train_classifier.py.
+
+    python backend/classification/compare_backends.py --max-drop 0.01
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.preprocessing.image import ImageDataGenerator
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classification.tflite_backend import TFLiteClassifier
+from classification.export_classifier import KERAS_PATH, TFLITE_PATH
+
+val_dir = "backend/dataset_cnn/val"
+
+
+def load_val_split(batch_size):
+    val_datagen = ImageDataGenerator(rescale=1.0/255)
+    val_gen = val_datagen.flow_from_directory(
+        val_dir,
+        target_size=(224, 224),
+        batch_size=batch_size,
+        class_mode="binary",
+        shuffle=False
+    )
+
+    images, labels = [], []
+    for _ in range(len(val_gen)):
+        x, y = next(val_gen)
+        images.append(x)
+        labels.append(y)
+    return np.concatenate(images), np.concatenate(labels)
+
+
+def evaluate(model, images, labels, batch_size):
+    scores = []
+    timings = []
+    for start in range(0, len(images), batch_size):
+        batch = images[start:start + batch_size]
+        t0 = time.perf_counter()
+        scores.append(model.predict(batch, verbose=0)[:, 0])
+        timings.append((time.perf_counter() - t0) / len(batch))
+
+    scores = np.concatenate(scores)
+    predictions = (scores >= 0.5).astype(np.float32)
+    return {
+        "accuracy": float((predictions == labels).mean()),
+        "predictions": predictions,
+        "ms_per_image_p50": float(np.median(timings) * 1000.0),
+        "ms_per_image_mean": float(np.mean(timings) * 1000.0)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keras vs TFLite parity check")
+    parser.add_argument("--keras", default=KERAS_PATH)
+    parser.add_argument("--tflite", default=TFLITE_PATH)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--max-drop", type=float, default=0.01,
+                        help="largest allowed accuracy drop for the TFLite model")
+    args = parser.parse_args()
+
+    images, labels = load_val_split(args.batch_size)
+
+    keras_model = tf.keras.models.load_model(args.keras)
+    keras_model.predict(images[:1], verbose=0)   # warm-up
+    lite_model = TFLiteClassifier(args.tflite)
+
+    keras_stats = evaluate(keras_model, images, labels, args.batch_size)
+    lite_stats = evaluate(lite_model, images, labels, args.batch_size)
+    agreement = float((keras_stats["predictions"] == lite_stats["predictions"]).mean())
+
+    print(f"\n📊 Validation images: {len(images)}")
+    for name, stats in (("keras", keras_stats), ("tflite", lite_stats)):
+        print(
+            f" - {name:<7} accuracy {stats['accuracy']:.4f}   "
+            f"p50 {stats['ms_per_image_p50']:.2f} ms/img   "
+            f"mean {stats['ms_per_image_mean']:.2f} ms/img"
+        )
+    print(f" - label agreement {agreement:.4f}")
+
+    drop = keras_stats["accuracy"] - lite_stats["accuracy"]
+    if drop > args.max_drop:
+        print(f"❌ TFLite accuracy drop {drop:.4f} exceeds {args.max_drop}")
+        sys.exit(1)
+
+    print("✅ TFLite model within accuracy tolerance")
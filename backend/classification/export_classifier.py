@@ -0,0 +1,81 @@
+"""
+Export the trained Keras classifier to an int8 TFLite model for CPU serving.
+
+    python backend/classification/export_classifier.py
+
+Calibration images are drawn from the training subset made by
+prepare_subset.py. Check the result with compare_backends.py.
+"""
+import argparse
+import os
+import random
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.preprocessing import image
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+KERAS_PATH = os.path.join(HERE, "biowaste_classifier.keras")
+TFLITE_PATH = os.path.join(HERE, "biowaste_classifier_int8.tflite")
+
+train_dir = "backend/dataset_cnn/train"
+
+CALIBRATION_IMAGES = 200
+
+
+def calibration_files(root, count, seed=0):
+    files = []
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            if name.lower().endswith((".jpg", ".png", ".jpeg")):
+                files.append(os.path.join(dirpath, name))
+
+    files.sort()
+    random.Random(seed).shuffle(files)
+    return files[:count]
+
+
+def representative_dataset(files):
+    def _gen():
+        for path in files:
+            img = image.load_img(path, target_size=(224, 224))
+            arr = image.img_to_array(img) / 255.0
+            yield [np.expand_dims(arr, axis=0).astype(np.float32)]
+    return _gen
+
+
+def export(keras_path, tflite_path, data_dir, count, full_int8=True):
+    model = tf.keras.models.load_model(keras_path)
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    files = calibration_files(data_dir, count)
+    if files:
+        converter.representative_dataset = representative_dataset(files)
+        if full_int8:
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+            converter.inference_input_type = tf.int8
+            converter.inference_output_type = tf.int8
+    else:
+        # No calibration data: weights-only (dynamic range) quantization
+        print("⚠ No calibration images found; exporting dynamic-range model")
+
+    tflite_model = converter.convert()
+    with open(tflite_path, "wb") as f:
+        f.write(tflite_model)
+
+    print(f"✅ Exported {tflite_path} ({len(tflite_model) / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export classifier to int8 TFLite")
+    parser.add_argument("--keras", default=KERAS_PATH)
+    parser.add_argument("--output", default=TFLITE_PATH)
+    parser.add_argument("--data", default=train_dir)
+    parser.add_argument("--calibration-images", type=int, default=CALIBRATION_IMAGES)
+    parser.add_argument("--float-io", action="store_true",
+                        help="keep float32 input/output (int8 weights and activations inside)")
+    args = parser.parse_args()
+
+    export(args.keras, args.output, args.data, args.calibration_images, not args.float_io)
@@ -1,62 +1,276 @@
+"""
+Build the classifier training subset (backend/dataset_cnn) from the full
+dataset (backend/dataset).
+
+    python backend/classification/prepare_subset.py
+    python backend/classification/prepare_subset.py --seed 7 --train-count 2000
+
+Selection is seeded and stable: each file gets a rank from hash(seed, name),
+so adding files to the source only swaps in the newcomers that outrank
+current picks. Identical images (same content hash) are used once across
+train and val; val is filled first so the held-out set stays put.
+
+A manifest (dataset_cnn/manifest.json) records hash, size and split of
+every file. Re-runs only link/copy what changed and remove what is no
+longer selected; on an unchanged source nothing is read but directory
+listings. dataset_cnn is owned by this script: other images in its class
+folders are removed.
+"""
+import argparse
+import hashlib
+import json
 import os
-import random
 import shutil
-from pathlib import Path
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # ---------------------------------------------
-# SOURCE DATASET LOCATION (your actual dataset)
+# SOURCE / TARGET DATASET LOCATIONS
 # ---------------------------------------------
-SRC_TRAIN_BIO = Path("backend/dataset/train/biodegradable")
-SRC_TRAIN_NON = Path("backend/dataset/train/non_biodegradable")
+SRC_ROOT = "backend/dataset"
+DST_ROOT = "backend/dataset_cnn"
 
-SRC_VAL_BIO = Path("backend/dataset/val/biodegradable")
-SRC_VAL_NON = Path("backend/dataset/val/non_biodegradable")
+CLASSES = ["biodegradable", "non_biodegradable"]
+IMAGE_EXTENSIONS = (".jpg", ".png", ".jpeg")
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
 
 # ---------------------------------------------
-# TARGET (subset) dataset
+# HOW MANY IMAGES YOU WANT IN SUBSET (per class)
 # ---------------------------------------------
-DST_TRAIN_BIO = Path("backend/dataset_cnn/train/biodegradable")
-DST_TRAIN_NON = Path("backend/dataset_cnn/train/non_biodegradable")
+TRAIN_COUNT = 960
+VAL_COUNT = 240
+
+SEED = 42
+LINK_MODE = "hardlink"    # "hardlink" (falls back to copy across devices) or "copy"
+WORKERS = 8
 
-DST_VAL_BIO = Path("backend/dataset_cnn/val/biodegradable")
-DST_VAL_NON = Path("backend/dataset_cnn/val/non_biodegradable")
 
 # ---------------------------------------------
-# HOW MANY IMAGES YOU WANT IN SUBSET
+# Manifest
 # ---------------------------------------------
-TRAIN_COUNT = 960
-VAL_COUNT = 240
+def load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "hashes": {}, "files": {}}
+
+
+def save_manifest(path, manifest):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# ---------------------------------------------
+# Source scanning and hashing
+# ---------------------------------------------
+def scan_images(directory):
+    """{path: (size, mtime_ns)} for the images in a directory."""
+    found = {}
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return found
+
+    with entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                st = entry.stat()
+                found[entry.path] = (st.st_size, st.st_mtime_ns)
+    return found
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class HashCache:
+    """Content hashes keyed by (path, size, mtime); reused across runs."""
 
+    def __init__(self, entries, pool):
+        self.entries = entries
+        self.pool = pool
+        self.computed = 0
 
-def select_and_copy(src, dst, max_count):
-    files = [f for f in os.listdir(src) if f.lower().endswith((".jpg", ".png", ".jpeg"))]
-    random.shuffle(files)
-    selected = files[:max_count]
+    def get_many(self, paths, stats):
+        missing = [
+            p for p in paths
+            if self.entries.get(p, {}).get("stat") != list(stats[p])
+        ]
+        for path, digest in zip(missing, self.pool.map(file_sha256, missing)):
+            self.entries[path] = {"stat": list(stats[path]), "sha256": digest}
+        self.computed += len(missing)
+        return [self.entries[p]["sha256"] for p in paths]
 
-    for f in selected:
-        shutil.copy(src / f, dst / f)
 
+def rank_key(seed, path):
+    return hashlib.sha1(f"{seed}:{os.path.basename(path)}".encode("utf-8")).hexdigest()
 
-def ensure_dirs():
-    for d in [DST_TRAIN_BIO, DST_TRAIN_NON, DST_VAL_BIO, DST_VAL_NON]:
-        os.makedirs(d, exist_ok=True)
+
+def select(stats, count, seed, hashes, taken):
+    """
+    Up to `count` files in seeded rank order, skipping content already in
+    `taken` (which is updated). Returns [(path, sha256)] and the number of
+    duplicates skipped.
+    """
+    ranked = sorted(stats, key=lambda p: rank_key(seed, p))
+    selected, duplicates, pos = [], 0, 0
+
+    while len(selected) < count and pos < len(ranked):
+        chunk = ranked[pos:pos + count - len(selected)]
+        pos += len(chunk)
+
+        for path, digest in zip(chunk, hashes.get_many(chunk, stats)):
+            if digest in taken:
+                duplicates += 1
+                continue
+            taken.add(digest)
+            selected.append((path, digest))
+
+    return selected, duplicates
 
 
 # ---------------------------------------------
-# MAIN
+# Syncing the subset directory
 # ---------------------------------------------
-ensure_dirs()
+def place(src, dst, link_mode):
+    if os.path.lexists(dst):
+        os.remove(dst)
+
+    if link_mode == "hardlink":
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass   # cross-device, or links unsupported
+    shutil.copy2(src, dst)
+
+
+def is_current(dst, entry, previous):
+    if previous is None or previous["sha256"] != entry["sha256"]:
+        return False
+    try:
+        return os.stat(dst).st_size == entry["size"]
+    except FileNotFoundError:
+        return False
+
+
+def build_subset(
+    src_root=SRC_ROOT,
+    dst_root=DST_ROOT,
+    train_count=TRAIN_COUNT,
+    val_count=VAL_COUNT,
+    seed=SEED,
+    link_mode=LINK_MODE,
+    workers=WORKERS
+):
+    start = time.perf_counter()
+    manifest_path = os.path.join(dst_root, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+
+    desired = {}
+    duplicates = 0
+    taken = set()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        hashes = HashCache(manifest["hashes"], pool)
+
+        # Val first: the held-out set takes priority on duplicates
+        for split, count in (("val", val_count), ("train", train_count)):
+            for cls in CLASSES:
+                stats = scan_images(os.path.join(src_root, split, cls))
+                selected, skipped = select(stats, count, f"{seed}:{split}:{cls}", hashes, taken)
+                duplicates += skipped
+
+                print(f"📦 {split}/{cls}: {len(selected)} of {len(stats)} image(s)")
+                for path, digest in selected:
+                    rel = os.path.join(split, cls, os.path.basename(path))
+                    desired[rel] = {
+                        "source": path,
+                        "sha256": digest,
+                        "size": stats[path][0],
+                        "split": split,
+                        "label": cls
+                    }
+
+        previous = manifest["files"]
+        changed = [
+            rel for rel, entry in desired.items()
+            if not is_current(os.path.join(dst_root, rel), entry, previous.get(rel))
+        ]
+
+        for split in ("train", "val"):
+            for cls in CLASSES:
+                os.makedirs(os.path.join(dst_root, split, cls), exist_ok=True)
+
+        list(pool.map(
+            lambda rel: place(desired[rel]["source"], os.path.join(dst_root, rel), link_mode),
+            changed
+        ))
+
+    # Anything in the class folders that is no longer selected
+    removed = 0
+    for split in ("train", "val"):
+        for cls in CLASSES:
+            for path in scan_images(os.path.join(dst_root, split, cls)):
+                if os.path.join(split, cls, os.path.basename(path)) not in desired:
+                    os.remove(path)
+                    removed += 1
+
+    # Drop hash entries for sources that no longer exist
+    manifest["hashes"] = {p: h for p, h in manifest["hashes"].items() if os.path.exists(p)}
+    manifest.update({
+        "seed": seed,
+        "counts": {"train": train_count, "val": val_count},
+        "files": desired
+    })
+    save_manifest(manifest_path, manifest)
+
+    summary = {
+        "files": len(desired),
+        "placed": len(changed),
+        "unchanged": len(desired) - len(changed),
+        "removed": removed,
+        "hashed": hashes.computed,
+        "duplicates_skipped": duplicates,
+        "seconds": round(time.perf_counter() - start, 2)
+    }
+    print(f"\n🎉 Subset ready: {summary}")
+    return summary
 
-print("📦 Creating TRAIN subset (biodegradable)...")
-select_and_copy(SRC_TRAIN_BIO, DST_TRAIN_BIO, TRAIN_COUNT)
 
-print("📦 Creating TRAIN subset (non-biodegradable)...")
-select_and_copy(SRC_TRAIN_NON, DST_TRAIN_NON, TRAIN_COUNT)
+def main():
+    parser = argparse.ArgumentParser(description="Build the classifier training subset")
+    parser.add_argument("--src", default=SRC_ROOT)
+    parser.add_argument("--dst", default=DST_ROOT)
+    parser.add_argument("--train-count", type=int, default=TRAIN_COUNT, help="per class")
+    parser.add_argument("--val-count", type=int, default=VAL_COUNT, help="per class")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--link", choices=["hardlink", "copy"], default=LINK_MODE)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
 
-print("📦 Creating VAL subset (biodegradable)...")
-select_and_copy(SRC_VAL_BIO, DST_VAL_BIO, VAL_COUNT)
+    build_subset(
+        src_root=args.src,
+        dst_root=args.dst,
+        train_count=args.train_count,
+        val_count=args.val_count,
+        seed=args.seed,
+        link_mode=args.link,
+        workers=args.workers
+    )
 
-print("📦 Creating VAL subset (non-biodegradable)...")
-select_and_copy(SRC_VAL_NON, DST_VAL_NON, VAL_COUNT)
 
-print("\n🎉 Subset creation complete!")
+if __name__ == "__main__":
+    main()
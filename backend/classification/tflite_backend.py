@@ -0,0 +1,71 @@
+import threading
+
+import numpy as np
+
+
+def _load_interpreter_class():
+    # tflite_runtime is a few MB; full TensorFlow works as a fallback
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteClassifier:
+    """
+    Runs the exported (int8) classifier with the TFLite interpreter.
+
+    Exposes the same predict(batch, verbose=0) call as the Keras model so
+    classify.py does not care which backend is loaded.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        Interpreter = _load_interpreter_class()
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.batch_size = int(self.input["shape"][0])
+
+        # The interpreter is stateful, so calls are serialized
+        self.lock = threading.Lock()
+
+    def _quantize(self, batch):
+        dtype = self.input["dtype"]
+        if dtype == np.float32:
+            return batch.astype(np.float32)
+
+        scale, zero_point = self.input["quantization"]
+        info = np.iinfo(dtype)
+        q = np.round(batch / scale + zero_point)
+        return np.clip(q, info.min, info.max).astype(dtype)
+
+    def _dequantize(self, values):
+        if self.output["dtype"] == np.float32:
+            return values.astype(np.float32)
+
+        scale, zero_point = self.output["quantization"]
+        return (values.astype(np.float32) - zero_point) * scale
+
+    def predict(self, batch, verbose=0):
+        batch = np.asarray(batch, dtype=np.float32)
+
+        with self.lock:
+            # Resize only when the batch size changes (re-allocation is costly)
+            if len(batch) != self.batch_size:
+                self.interpreter.resize_tensor_input(
+                    self.input["index"], [len(batch), *self.input["shape"][1:]]
+                )
+                self.interpreter.allocate_tensors()
+                self.input = self.interpreter.get_input_details()[0]
+                self.output = self.interpreter.get_output_details()[0]
+                self.batch_size = len(batch)
+
+            self.interpreter.set_tensor(self.input["index"], self._quantize(batch))
+            self.interpreter.invoke()
+            values = self.interpreter.get_tensor(self.output["index"])
+
+        return self._dequantize(values)
@@ -1,68 +1,243 @@
+"""
+Train the biodegradability classifier (MobileNetV2 base, frozen).
+
+    python backend/classification/train_classifier.py                 # cached features
+    python backend/classification/train_classifier.py --aug-views 4   # + 4 augmented views per image
+    python backend/classification/train_classifier.py --mode end-to-end
+
+"features" mode runs every image through the frozen backbone once, stores
+the pooled features under feature_cache/ and trains only the head on them;
+later runs on an unchanged dataset skip the backbone entirely. Both modes
+read images with a parallel tf.data pipeline (decode cache + prefetch).
+"""
+import argparse
+import hashlib
+import os
+import time
+
+import numpy as np
 import tensorflow as tf
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.applications import MobileNetV2
-from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout
+from tensorflow.keras.layers import Dense, Dropout, Input
 from tensorflow.keras.models import Model
 
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(HERE, "biowaste_classifier.keras")
+CACHE_DIR = os.path.join(HERE, "feature_cache")
+
 train_dir = "backend/dataset_cnn/train"
 val_dir = "backend/dataset_cnn/val"
 
+IMAGE_SIZE = (224, 224)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+AUTOTUNE = tf.data.AUTOTUNE
+
+
 # -------------------------
-# DATA GENERATORS (with augmentation)
+# INPUT PIPELINE
 # -------------------------
-train_datagen = ImageDataGenerator(
-    rescale=1.0/255,
-    rotation_range=15,
-    width_shift_range=0.1,
-    height_shift_range=0.1,
-    shear_range=0.1,
-    zoom_range=0.1,
-    horizontal_flip=True
-)
-
-val_datagen = ImageDataGenerator(rescale=1.0/255)
-
-train_gen = train_datagen.flow_from_directory(
-    train_dir,
-    target_size=(224, 224),
-    batch_size=16,
-    class_mode="binary"
-)
-
-val_gen = val_datagen.flow_from_directory(
-    val_dir,
-    target_size=(224, 224),
-    batch_size=16,
-    class_mode="binary"
-)
+def list_images(directory):
+    """(paths, labels, class_names); classes sorted like flow_from_directory."""
+    class_names = sorted(
+        d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d))
+    )
+    paths, labels = [], []
+    for label, name in enumerate(class_names):
+        class_dir = os.path.join(directory, name)
+        for filename in sorted(os.listdir(class_dir)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(class_dir, filename))
+                labels.append(label)
+    return paths, labels, class_names
+
+
+def decode_image(path):
+    data = tf.io.read_file(path)
+    img = tf.io.decode_image(data, channels=3, expand_animations=False)
+    # Nearest-neighbour, like load_img at inference time
+    img = tf.image.resize(img, IMAGE_SIZE, method="nearest")
+    return tf.cast(img, tf.uint8)
+
+
+def to_float(img):
+    return tf.cast(img, tf.float32) / 255.0
+
+
+def augmenter(seed=None):
+    # Same ranges as the old ImageDataGenerator (shear has no layer equivalent)
+    return tf.keras.Sequential([
+        tf.keras.layers.RandomRotation(15 / 360, seed=seed),
+        tf.keras.layers.RandomTranslation(0.1, 0.1, seed=seed),
+        tf.keras.layers.RandomZoom(0.1, seed=seed),
+        tf.keras.layers.RandomFlip("horizontal", seed=seed),
+    ])
+
+
+def make_dataset(paths, labels, batch_size, augment=None, shuffle=False, cache=True):
+    """
+    Decoding runs in parallel and decoded uint8 images are cached in memory
+    after the first pass; augmentation runs per batch on the fly.
+    """
+    ds = tf.data.Dataset.from_tensor_slices((paths, np.asarray(labels, dtype=np.float32)))
+    ds = ds.map(lambda p, y: (decode_image(p), y), num_parallel_calls=AUTOTUNE)
+    if cache:
+        ds = ds.cache()
+    if shuffle:
+        ds = ds.shuffle(len(paths), reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size)
+    ds = ds.map(lambda x, y: (to_float(x), y), num_parallel_calls=AUTOTUNE)
+    if augment is not None:
+        ds = ds.map(lambda x, y: (augment(x, training=True), y), num_parallel_calls=AUTOTUNE)
+    return ds.prefetch(AUTOTUNE)
+
 
 # -------------------------
 # MODEL
 # -------------------------
-base = MobileNetV2(weights="imagenet", include_top=False)
-base.trainable = False   # <-- CRUCIAL FIX
+def build_backbone():
+    base = MobileNetV2(
+        weights="imagenet", include_top=False, pooling="avg", input_shape=IMAGE_SIZE + (3,)
+    )
+    base.trainable = False
+    return base
 
-x = GlobalAveragePooling2D()(base.output)
-x = Dropout(0.3)(x)
-output = Dense(1, activation="sigmoid")(x)
 
-model = Model(inputs=base.input, outputs=output)
+def build_head(feature_dim):
+    features = Input(shape=(feature_dim,))
+    x = Dropout(0.3)(features)
+    output = Dense(1, activation="sigmoid")(x)
+    return Model(inputs=features, outputs=output, name="head")
+
+
+def build_classifier(base, head):
+    """Backbone + head as one model with the usual image input."""
+    return Model(inputs=base.input, outputs=head(base.output))
 
-model.compile(optimizer="adam", loss="binary_crossentropy", metrics=["accuracy"])
 
 # -------------------------
-# TRAINING
+# FEATURE CACHE
 # -------------------------
-print("Training model...")
-history = model.fit(
-    train_gen,
-    validation_data=val_gen,
-    epochs=6,               # <-- Increased for stability
-    verbose=1
-)
+def dataset_fingerprint(paths, views, seed):
+    h = hashlib.sha1(f"mobilenetv2-imagenet|{IMAGE_SIZE}|{views}|{seed}".encode("utf-8"))
+    for path in paths:
+        st = os.stat(path)
+        h.update(f"{path}|{st.st_size}|{st.st_mtime_ns}".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def extract_features(base, paths, labels, batch_size, views=0, seed=0):
+    """
+    Pooled backbone features for every image (view 0), plus `views`
+    augmented copies of each. Returns (features, labels).
+    """
+    ds = make_dataset(paths, labels, batch_size)
+    features = [base.predict(ds.map(lambda x, y: x), verbose=1)]
+
+    augment = augmenter(seed)
+    for view in range(views):
+        print(f"Extracting augmented view {view + 1}/{views}...")
+        aug = ds.map(lambda x, y: augment(x, training=True), num_parallel_calls=AUTOTUNE)
+        features.append(base.predict(aug, verbose=1))
+
+    return np.concatenate(features), np.tile(np.asarray(labels, dtype=np.float32), views + 1)
+
+
+def cached_features(base, directory, batch_size, views=0, seed=0, cache_dir=CACHE_DIR):
+    paths, labels, class_names = list_images(directory)
+    key = dataset_fingerprint(paths, views, seed)
+    cache_path = os.path.join(cache_dir, f"{os.path.basename(directory)}_{key}.npz")
+
+    if os.path.exists(cache_path):
+        print(f"Using cached features: {cache_path}")
+        data = np.load(cache_path)
+        return data["features"], data["labels"], class_names
+
+    start = time.perf_counter()
+    features, feature_labels = extract_features(base, paths, labels, batch_size, views, seed)
+    print(f"Extracted {len(features)} feature vectors in {time.perf_counter() - start:.1f}s")
+
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez(cache_path, features=features, labels=feature_labels)
+    return features, feature_labels, class_names
+
 
 # -------------------------
-# SAVE MODEL
+# TRAINING
 # -------------------------
-model.save("backend/classification/biowaste_classifier.keras")
-print("Model saved as biowaste_classifier.keras")
+def train_on_features(args):
+    base = build_backbone()
+
+    x_train, y_train, class_names = cached_features(
+        base, args.train_dir, args.batch_size, args.aug_views, args.seed
+    )
+    x_val, y_val, _ = cached_features(base, args.val_dir, args.batch_size)
+    print(f"Classes: {class_names}")
+
+    head = build_head(x_train.shape[1])
+    head.compile(optimizer="adam", loss="binary_crossentropy", metrics=["accuracy"])
+
+    print("Training head on cached features...")
+    head.fit(
+        x_train, y_train,
+        validation_data=(x_val, y_val),
+        epochs=args.epochs,
+        batch_size=args.head_batch_size,
+        shuffle=True,
+        verbose=2
+    )
+
+    return build_classifier(base, head)
+
+
+def train_end_to_end(args):
+    train_paths, train_labels, class_names = list_images(args.train_dir)
+    val_paths, val_labels, _ = list_images(args.val_dir)
+    print(f"Classes: {class_names}")
+
+    train_ds = make_dataset(
+        train_paths, train_labels, args.batch_size, augment=augmenter(args.seed), shuffle=True
+    )
+    val_ds = make_dataset(val_paths, val_labels, args.batch_size)
+
+    base = build_backbone()
+    model = build_classifier(base, build_head(base.output_shape[-1]))
+    model.compile(optimizer="adam", loss="binary_crossentropy", metrics=["accuracy"])
+
+    print("Training model...")
+    model.fit(train_ds, validation_data=val_ds, epochs=args.epochs, verbose=1)
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the biodegradability classifier")
+    parser.add_argument("--mode", choices=["features", "end-to-end"], default="features")
+    parser.add_argument("--train-dir", default=train_dir)
+    parser.add_argument("--val-dir", default=val_dir)
+    parser.add_argument("--epochs", type=int, default=None,
+                        help="default: 30 on cached features, 6 end-to-end")
+    parser.add_argument("--batch-size", type=int, default=64, help="images per backbone batch")
+    parser.add_argument("--head-batch-size", type=int, default=256)
+    parser.add_argument("--aug-views", type=int, default=0,
+                        help="augmented views per training image in the feature cache")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=MODEL_PATH)
+    args = parser.parse_args()
+
+    tf.keras.utils.set_random_seed(args.seed)
+
+    if args.mode == "features":
+        args.epochs = args.epochs or 30
+        model = train_on_features(args)
+    else:
+        args.epochs = args.epochs or 6
+        model = train_end_to_end(args)
+
+    # -------------------------
+    # SAVE MODEL
+    # -------------------------
+    model.save(args.output)
+    print(f"Model saved as {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import os
+import time
+import uuid
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from storage import storage
+from telemetry import get_logger, counter
+
+logger = get_logger("derivatives")
+
+
+# -------------------------------
+# Derivative settings
+# -------------------------------
+# Requested widths snap up to one of these, so the cache stays small
+WIDTHS = (256, 512, 1024)
+
+# AVIF needs OpenCV >= 4.10 built with libavif
+AVIF_PARAMS = [cv2.IMWRITE_AVIF_QUALITY, 60] if hasattr(cv2, "IMWRITE_AVIF_QUALITY") else []
+
+# format -> (extension, mimetype, encode params)
+FORMATS = {
+    "png": (".png", "image/png", [cv2.IMWRITE_PNG_COMPRESSION, 6]),
+    "jpeg": (".jpg", "image/jpeg", [cv2.IMWRITE_JPEG_QUALITY, 85]),
+    "webp": (".webp", "image/webp", [cv2.IMWRITE_WEBP_QUALITY, 80]),
+    "avif": (".avif", "image/avif", AVIF_PARAMS),
+}
+
+# Preference order for format=auto (first one the client accepts wins)
+AUTO_FORMATS = ["avif", "webp"]
+
+# Cache hits refresh the file's mtime (the janitor evicts oldest first),
+# at most this often per file
+TOUCH_INTERVAL = 24 * 60 * 60
+
+DERIVATIVES = counter(
+    "wastetoart_image_derivatives_total", "Derivative image lookups", ["outcome"]
+)
+
+
+@lru_cache(maxsize=None)
+def encoder_available(fmt):
+    """AVIF (and even WebP) depend on how OpenCV was built."""
+    ext, _, params = FORMATS[fmt]
+    try:
+        ok, _ = cv2.imencode(ext, np.zeros((8, 8, 3), dtype=np.uint8), params)
+        return bool(ok)
+    except cv2.error:
+        return False
+
+
+def parse_variant(width=None, fmt=None, accept=None):
+    """
+    Validates ?w= and ?format= and returns (width, format, negotiated).
+    width is None for full size; negotiated is True when the format came
+    from the Accept header. Raises ValueError on bad input.
+    """
+    if width:
+        try:
+            width = int(width)
+        except ValueError:
+            raise ValueError("w must be an integer")
+        if width <= 0:
+            raise ValueError("w must be positive")
+        width = next((w for w in WIDTHS if w >= width), None)
+    else:
+        width = None
+
+    fmt = (fmt or "png").lower()
+    if fmt == "jpg":
+        fmt = "jpeg"
+
+    negotiated = fmt == "auto"
+    if negotiated:
+        accept = accept or ""
+        fmt = next(
+            (f for f in AUTO_FORMATS if FORMATS[f][1] in accept and encoder_available(f)),
+            "png"
+        )
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    if not encoder_available(fmt):
+        raise ValueError(f"Format not available on this server: {fmt}")
+
+    return width, fmt, negotiated
+
+
+def image_etag(source_path, width, fmt):
+    """Derived from the source file, so it survives derivative re-creation."""
+    st = os.stat(source_path)
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}-{width or 'full'}-{fmt}"
+
+
+def derivative_path(source_path, width, fmt):
+    """
+    Returns (path, mimetype) of the requested variant, creating it on the
+    first request. The original PNG is returned as is when nothing changes.
+    """
+    ext, mimetype, params = FORMATS[fmt]
+    if width is None and fmt == "png":
+        return source_path, mimetype
+
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    name = f"{stem}_{width or 'full'}{ext}"
+    cached = storage.resolve("derivatives", name)
+
+    if cached is not None:
+        st = os.stat(cached)
+        if st.st_mtime >= os.stat(source_path).st_mtime:
+            DERIVATIVES.inc(outcome="hit")
+            if time.time() - st.st_mtime > TOUCH_INTERVAL:
+                os.utime(cached)
+            return cached, mimetype
+
+    DERIVATIVES.inc(outcome="miss")
+    img = cv2.imread(source_path, cv2.IMREAD_COLOR)
+    if img is None:
+        raise RuntimeError(f"Failed to read image: {source_path}")
+
+    h, w = img.shape[:2]
+    if width is not None and width < w:
+        img = cv2.resize(img, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+
+    ok, buffer = cv2.imencode(ext, img, params)
+    if not ok:
+        raise RuntimeError(f"Failed to encode {fmt}")
+
+    # Write-then-rename: concurrent requests never see a partial file
+    path = storage.path_for("derivatives", name)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(buffer.tobytes())
+    os.replace(tmp, path)
+
+    logger.debug("Created derivative %s (%d bytes)", name, len(buffer))
+    return path, mimetype
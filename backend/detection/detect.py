@@ -1,11 +1,27 @@
 # backend/detection/detect.py
 
-import os
 import uuid
 import cv2
-from ultralytics import YOLO
+import model_client
+from registry import registry
+from storage import storage
+from telemetry import timed, MODEL_SECONDS
+from detection.tiling import plan_tiles, merge_boxes
 
-MODEL = YOLO("yolov8n.pt")  # lightweight + fast
+
+# -------------------------------
+# Model (loaded on first use)
+# -------------------------------
+def _load_yolo():
+    # Shared model server configured: no torch in this process
+    if model_client.MODEL_SERVER:
+        return model_client.remote_detector()
+
+    from ultralytics import YOLO
+    return YOLO("yolov8n.pt")  # lightweight + fast
+
+
+registry.register("yolo", _load_yolo)
 
 # -------------------------------
 # BIODEGRADABLE (organic waste)
@@ -46,20 +62,126 @@ NONBIO_CLASSES = {
 VALID_CLASSES = ORGANIC_CLASSES.union(NONBIO_CLASSES)
 
 
-def run_detection(image_path):
+# -------------------------------
+# Crop persistence (debug / audit only)
+# -------------------------------
+# Crops are handed to the classifier in memory. Set this to True to also
+# write every crop to disk for inspection.
+SAVE_CROPS = False
 
-    results = MODEL(image_path)[0]
+# Images sent to YOLO in one forward pass by run_detections
+DETECT_BATCH_SIZE = 8
 
-    crop_dir = "backend/detection/crops"
-    os.makedirs(crop_dir, exist_ok=True)
+# Split large, cluttered photos into overlapping tiles (see tiling.py).
+# Images below tiling.TILE_MIN_SIDE always use the single-pass path.
+TILED_DETECTION = True
 
-    detections = []
+
+def run_detection(image, save_crops=None, tiled=None):
+    """
+    image: decoded BGR array (preferred) or an image path.
+    """
+    if tiled is None:
+        tiled = TILED_DETECTION
+
+    if tiled:
+        image = _as_array(image)
+        windows = plan_tiles(*image.shape[:2])
+        if windows:
+            return detect_tiled(image, windows, save_crops)
+
+    model = registry.get("yolo")
+
+    with timed(MODEL_SECONDS, model="yolo"):
+        results = model(image)[0]
+
+    return extract_detections(results, save_crops)
+
+
+def run_detections(images, save_crops=None, batch_size=None, tiled=None):
+    """
+    Runs YOLO over many images in batches.
+    Returns one detection list per image, in the same order.
+    Large images are tiled individually; the rest share batches.
+    """
+    batch_size = batch_size or DETECT_BATCH_SIZE
+    if tiled is None:
+        tiled = TILED_DETECTION
+
+    all_detections = [None] * len(images)
+    single_pass = []
+
+    for i, image in enumerate(images):
+        if tiled:
+            image = _as_array(image)
+            windows = plan_tiles(*image.shape[:2])
+            if windows:
+                all_detections[i] = detect_tiled(image, windows, save_crops)
+                continue
+        single_pass.append((i, image))
+
+    if single_pass:
+        model = registry.get("yolo")
+
+    for start in range(0, len(single_pass), batch_size):
+        chunk = single_pass[start:start + batch_size]
+        with timed(MODEL_SECONDS, model="yolo"):
+            batch_results = model([image for _, image in chunk])
+
+        for (i, _), results in zip(chunk, batch_results):
+            all_detections[i] = extract_detections(results, save_crops)
+
+    return all_detections
+
+
+def detect_tiled(image, windows, save_crops=None):
+    """
+    One YOLO batch over the full (downscaled) image plus every tile.
+    The full pass keeps large objects that tiles would cut in half.
+    """
+    model = registry.get("yolo")
+    sources = [image] + [image[y1:y2, x1:x2] for x1, y1, x2, y2 in windows]
+    offsets = [(0, 0)] + [(x1, y1) for x1, y1, _, _ in windows]
+
+    with timed(MODEL_SECONDS, model="yolo"):
+        batch_results = model(sources)
+
+    boxes = []
+    for results, offset in zip(batch_results, offsets):
+        boxes.extend(boxes_from_results(results, offset))
+
+    return build_detections(image, merge_boxes(boxes), save_crops)
+
+
+def extract_detections(results, save_crops=None):
+    return build_detections(results.orig_img, boxes_from_results(results), save_crops)
+
+
+def boxes_from_results(results, offset=(0, 0)):
+    """Returns (cls_name, conf, [x1, y1, x2, y2]) tuples in global coordinates."""
+    dx, dy = offset
+    boxes = []
 
     for box in results.boxes:
         cls_id = int(box.cls[0])
         cls_name = results.names[cls_id].lower()
         conf = float(box.conf[0])
 
+        x1, y1, x2, y2 = box.xyxy[0].tolist()
+        boxes.append((cls_name, conf, [x1 + dx, y1 + dy, x2 + dx, y2 + dy]))
+
+    return boxes
+
+
+def build_detections(orig_img, boxes, save_crops=None):
+
+    if save_crops is None:
+        save_crops = SAVE_CROPS
+
+    detections = []
+
+    for cls_name, conf, xyxy in boxes:
+
         # Filter out unrelated classes
         if cls_name not in VALID_CLASSES:
             continue
@@ -68,19 +190,31 @@ def run_detection(image_path):
         if conf < 0.30:
             continue
 
-        # Clean cropping
-        x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-        crop = results.orig_img[y1:y2, x1:x2]
+        # Clean cropping (BGR view into the original image, no copy)
+        x1, y1, x2, y2 = map(int, xyxy)
+        crop = orig_img[y1:y2, x1:x2]
 
-        crop_path = os.path.join(crop_dir, f"{uuid.uuid4().hex}.jpg")
-        cv2.imwrite(crop_path, crop)
+        crop_path = None
+        if save_crops:
+            crop_path = storage.path_for("crops", f"{uuid.uuid4().hex}.jpg")
+            cv2.imwrite(crop_path, crop)
 
         detections.append({
             "class": cls_name,
             "conf": conf,
+            "crop": crop,
             "crop_path": crop_path,
             "bbox": [x1, y1, x2, y2]
 
         })
 
     return detections
+
+
+def _as_array(image):
+    if isinstance(image, str):
+        decoded = cv2.imread(image)
+        if decoded is None:
+            raise RuntimeError(f"Failed to read image {image}")
+        return decoded
+    return image
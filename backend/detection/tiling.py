@@ -0,0 +1,109 @@
+# backend/detection/tiling.py
+
+import math
+
+import numpy as np
+
+
+# -------------------------------
+# Tiling settings
+# -------------------------------
+TILE_SIZE = 640            # YOLO's native input size
+TILE_OVERLAP = 0.2         # fraction of a tile shared with its neighbour
+# Once the long side clearly exceeds YOLO's input, the single pass
+# downscales it and small items fall below what YOLO can see; smaller
+# images keep the single pass
+TILE_MIN_SIDE = round(1.1 * TILE_SIZE)
+MAX_TILES_PER_AXIS = 4
+NMS_IOU_THRESHOLD = 0.5
+CONTAIN_THRESHOLD = 0.8    # share of a box inside a larger same-class box that makes it a fragment
+
+
+def plan_tiles(height, width, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, min_side=TILE_MIN_SIDE):
+    """
+    Picks an overlapping tile grid from the image resolution.
+    Returns a list of (x1, y1, x2, y2) windows, or [] for small images.
+    """
+    if max(height, width) < min_side:
+        return []
+
+    xs = _axis_windows(width, tile_size, overlap)
+    ys = _axis_windows(height, tile_size, overlap)
+    return [(x1, y1, x2, y2) for y1, y2 in ys for x1, x2 in xs]
+
+
+def _axis_windows(length, tile_size, overlap):
+    count = min(MAX_TILES_PER_AXIS, max(1, math.ceil(length / tile_size)))
+    if count == 1:
+        return [(0, length)]
+
+    # Grow the tile so `count` tiles with the given overlap cover the axis
+    size = math.ceil(length / (count - (count - 1) * overlap))
+    step = (length - size) / (count - 1)
+    return [(round(i * step), round(i * step) + size) for i in range(count)]
+
+
+def nms(boxes, scores, iou_threshold=NMS_IOU_THRESHOLD):
+    """Greedy non-maximum suppression. Returns kept indices, best first."""
+    if len(boxes) == 0:
+        return []
+
+    boxes = np.asarray(boxes, dtype=np.float32)
+    x1, y1, x2, y2 = boxes.T
+    areas = np.maximum(0, x2 - x1) * np.maximum(0, y2 - y1)
+    order = np.argsort(scores)[::-1]
+
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(int(i))
+
+        xx1 = np.maximum(x1[i], x1[order[1:]])
+        yy1 = np.maximum(y1[i], y1[order[1:]])
+        xx2 = np.minimum(x2[i], x2[order[1:]])
+        yy2 = np.minimum(y2[i], y2[order[1:]])
+        inter = np.maximum(0, xx2 - xx1) * np.maximum(0, yy2 - yy1)
+        iou = inter / np.maximum(areas[i] + areas[order[1:]] - inter, 1e-6)
+
+        order = order[1:][iou <= iou_threshold]
+
+    return keep
+
+
+def _area(xyxy):
+    return max(0, xyxy[2] - xyxy[0]) * max(0, xyxy[3] - xyxy[1])
+
+
+def _intersection(a, b):
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    return max(0, w) * max(0, h)
+
+
+def drop_contained(boxes, threshold=CONTAIN_THRESHOLD):
+    """
+    Removes boxes lying mostly inside a larger box, e.g. the part of an
+    object a tile seam cut off next to the full-image box. Their IoU is
+    low, so NMS alone keeps both. Expects boxes of one class.
+    """
+    kept = []
+    for box in sorted(boxes, key=lambda b: _area(b[2]), reverse=True):
+        area = max(_area(box[2]), 1e-6)
+        if not any(_intersection(box[2], k[2]) >= threshold * area for k in kept):
+            kept.append(box)
+    return kept
+
+
+def merge_boxes(boxes, iou_threshold=NMS_IOU_THRESHOLD, contain_threshold=CONTAIN_THRESHOLD):
+    """
+    Cross-tile, class-aware NMS, then removal of cut-off fragments.
+    boxes: list of (cls_name, conf, [x1, y1, x2, y2]) in global coordinates.
+    """
+    merged = []
+    for cls_name in sorted({b[0] for b in boxes}):
+        same = [b for b in boxes if b[0] == cls_name]
+        keep = nms([b[2] for b in same], np.array([b[1] for b in same]), iou_threshold)
+        merged.extend(drop_contained([same[i] for i in keep], contain_threshold))
+
+    merged.sort(key=lambda b: b[1], reverse=True)
+    return merged
@@ -1,6 +1,19 @@
-from sentence_transformers import SentenceTransformer
+from registry import registry
 
-sbert = SentenceTransformer("all-MiniLM-L6-v2")
+
+def _load_sbert():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer("all-MiniLM-L6-v2")
+
+
+registry.register("sbert", _load_sbert)
 
 def get_text_embedding(text):
-    return sbert.encode(text)
+    return registry.get("sbert").encode(text)
+
+
+def get_text_embeddings(texts, normalize=False):
+    """Encodes many texts in one batched call; returns a (n, dim) matrix."""
+    return registry.get("sbert").encode(
+        list(texts), normalize_embeddings=normalize, convert_to_numpy=True
+    )
@@ -1,116 +1,237 @@
-import requests
 import base64
+import threading
+import uuid
 import cv2
+import numpy as np
+
+from generation.sd_client import SDUnavailableError
+from generation.sd_pool import SDPool
+from telemetry import get_logger, timed, MODEL_SECONDS
+
+logger = get_logger("generate")
 
 
 SD_URL = "http://127.0.0.1:7860"
 
+# One or more WebUI instances; generations go to the least-loaded healthy one
+SD_URLS = [SD_URL]
+
+# Shared, pooled client (keep-alive, retries, circuit breaker, load balancing)
+sd_client = SDPool(SD_URLS)
+
+# Live progress while a generation runs (see ProgressPoller)
+PROGRESS_INTERVAL = 1.0   # seconds between polls
+
 
 # --------------------------------------------------
 # Encode image to base64 (for img2img)
 # --------------------------------------------------
-def encode_image_to_base64(path):
-    img = cv2.imread(path)
+# Lossless either way; level 1 is much cheaper to encode than the default 3
+PNG_COMPRESSION = 1
+
+
+def encode_image_to_base64(image):
+    # Already-decoded BGR array (shared with detection) or a file path
+    if isinstance(image, np.ndarray):
+        img = image
+    else:
+        img = cv2.imread(image)
     if img is None:
         raise RuntimeError("Failed to read input image for img2img")
 
-    _, buffer = cv2.imencode(".png", img)
+    _, buffer = cv2.imencode(".png", img, [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION])
     return base64.b64encode(buffer).decode("utf-8")
 
 
+# --------------------------------------------------
+# Request payloads
+# --------------------------------------------------
+def build_request(prompt, negative_prompt, input_image=None):
+    """Returns (api_path, payload) for img2img or the txt2img fallback."""
+
+    # ==========================================================
+    # MODE 1 — IMG2IMG (Preserve shape + transform into art)
+    # ==========================================================
+    if input_image is not None:
+        logger.info("Sending IMG2IMG request to Stable Diffusion...")
+
+        img_b64 = encode_image_to_base64(input_image)
+
+        payload = {
+            "init_images": [img_b64],
+            "prompt": prompt,
+            "negative_prompt": (
+                negative_prompt
+                + ", original background, realistic photo, unchanged object, duplicate image"
+            ),
+
+            # Transformation strength (KEY)
+            "denoising_strength": 0.65,
+
+            "steps": 32,
+            "cfg_scale": 5.8,
+            "sampler_name": "DPM++ 2M Karras",
+
+            "width": 512,
+            "height": 512,
+            "seed": -1,
+
+            # High resolution pass
+            "enable_hr": True,
+            "hr_scale": 1.8,
+            "hr_upscaler": "Latent",
+            "hr_second_pass_steps": 16,
+        }
+
+        return "/sdapi/v1/img2img", payload
+
+    # ==========================================================
+    # MODE 2 — TXT2IMG (Fallback)
+    # ==========================================================
+    logger.info("Sending TXT2IMG request to Stable Diffusion...")
+
+    payload = {
+        "prompt": prompt,
+        "negative_prompt": negative_prompt,
+
+        "steps": 30,
+        "cfg_scale": 7.0,
+        "sampler_name": "DPM++ 2M Karras",
+
+        "width": 512,
+        "height": 512,
+        "seed": -1,
+
+        "enable_hr": True,
+        "hr_scale": 1.8,
+        "hr_upscaler": "Latent",
+        "hr_second_pass_steps": 18,
+    }
+
+    return "/sdapi/v1/txt2img", payload
+
+
+# --------------------------------------------------
+# Response handling (requests and httpx responses alike)
+# --------------------------------------------------
+def save_response(response, output_path):
+    if response.status_code != 200:
+        raise RuntimeError(f"SD Error {response.status_code}: {response.text}")
+
+    img_data = response.json()["images"][0]
+    img_bytes = base64.b64decode(img_data.split(",", 1)[0])
+
+    with open(output_path, "wb") as f:
+        f.write(img_bytes)
+
+    logger.info("Image saved: %s", output_path)
+    return output_path
+
+
+# --------------------------------------------------
+# Sampling progress (WebUI /internal/progress, per task)
+# --------------------------------------------------
+def progress_event(state):
+    """Compact progress update; the preview is only set when a newer one exists."""
+    return {
+        "progress": round(float(state.get("progress") or 0.0), 3),
+        "eta": round(float(state.get("eta") or 0.0), 1),
+        "preview": state.get("live_preview") or None
+    }
+
+
+class ProgressPoller:
+    """
+    Reports the progress of one generation. The request carries our own
+    force_task_id and is polled on the backend the pool routed it to, so
+    another user's job on the same WebUI is never reported.
+    """
+
+    def __init__(self, on_progress, interval=PROGRESS_INTERVAL):
+        self.task_id = f"task(wastetoart-{uuid.uuid4().hex})"
+        self.on_progress = on_progress
+        self.interval = interval
+        self.backend = None
+        self.stop_event = threading.Event()
+
+    def routed(self, backend):
+        # Called again if the pool fails over to another backend
+        self.backend = backend
+
+    def start(self):
+        threading.Thread(target=self._loop, name="sd-progress", daemon=True).start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _loop(self):
+        preview_id = -1
+
+        while not self.stop_event.wait(self.interval):
+            backend = self.backend
+            if backend is None:
+                continue
+
+            state = backend.task_progress(self.task_id, preview_id)
+            if state is None or not state.get("active") or self.stop_event.is_set():
+                continue
+
+            self.on_progress(progress_event(state))
+            preview_id = state.get("id_live_preview", preview_id)
+
+
 # --------------------------------------------------
 # Main generation function
 # --------------------------------------------------
-def generate_art(prompt, negative_prompt, output_path, input_image=None):
+def generate_art(prompt, negative_prompt, output_path, input_image=None, on_progress=None):
+    """
+    on_progress: optional callable, fed progress_event() dicts while the
+    WebUI samples this request (progress, ETA and a low-res live preview).
+    """
+    poller = None
 
     try:
-        # ==========================================================
-        # MODE 1 — IMG2IMG (Preserve shape + transform into art)
-        # ==========================================================
-        if input_image is not None:
-            print("Sending IMG2IMG request to Stable Diffusion...")
-
-            img_b64 = encode_image_to_base64(input_image)
-
-            payload = {
-                "init_images": [img_b64],
-                "prompt": prompt,
-                "negative_prompt": (
-                    negative_prompt
-                    + ", original background, realistic photo, unchanged object, duplicate image"
-                ),
-
-                # Transformation strength (KEY)
-                "denoising_strength": 0.65,
-
-                "steps": 32,
-                "cfg_scale": 5.8,
-                "sampler_name": "DPM++ 2M Karras",
-
-                "width": 512,
-                "height": 512,
-                "seed": -1,
-
-                # High resolution pass
-                "enable_hr": True,
-                "hr_scale": 1.8,
-                "hr_upscaler": "Latent",
-                "hr_second_pass_steps": 16,
-            }
-
-            response = requests.post(
-                f"{SD_URL}/sdapi/v1/img2img",
-                json=payload,
-                timeout=180
-            )
-
-        # ==========================================================
-        # MODE 2 — TXT2IMG (Fallback)
-        # ==========================================================
-        else:
-            print("Sending TXT2IMG request to Stable Diffusion...")
-
-            payload = {
-                "prompt": prompt,
-                "negative_prompt": negative_prompt,
-
-                "steps": 30,
-                "cfg_scale": 7.0,
-                "sampler_name": "DPM++ 2M Karras",
-
-                "width": 512,
-                "height": 512,
-                "seed": -1,
-
-                "enable_hr": True,
-                "hr_scale": 1.8,
-                "hr_upscaler": "Latent",
-                "hr_second_pass_steps": 18,
-            }
-
-            response = requests.post(
-                f"{SD_URL}/sdapi/v1/txt2img",
-                json=payload,
-                timeout=180
-            )
-
-        # ==========================================================
-        # Handle response
-        # ==========================================================
-        if response.status_code != 200:
-            raise RuntimeError(f"SD Error {response.status_code}: {response.text}")
-
-        img_data = response.json()["images"][0]
-        img_bytes = base64.b64decode(img_data.split(",", 1)[0])
-
-        with open(output_path, "wb") as f:
-            f.write(img_bytes)
-
-        print("Image saved:", output_path)
-        return output_path
-
-    except requests.exceptions.ConnectionError:
-        raise RuntimeError("Stable Diffusion not running")
+        path, payload = build_request(prompt, negative_prompt, input_image)
+
+        with timed(MODEL_SECONDS, model="stable_diffusion"):
+            if on_progress is None:
+                response = sd_client.post(path, payload)
+            else:
+                poller = ProgressPoller(on_progress)
+                payload["force_task_id"] = poller.task_id
+                poller.start()
+                response = sd_client.post(path, payload, on_route=poller.routed)
+
+        return save_response(response, output_path)
+
+    except SDUnavailableError:
+        raise
+
+    except Exception as e:
+        raise RuntimeError(f"Generation failed: {str(e)}")
+
+    finally:
+        if poller is not None:
+            poller.stop()
+
+
+async def generate_art_async(prompt, negative_prompt, output_path, input_image=None, client=None):
+    """
+    Same as generate_art, but the SD round-trip is awaited on a
+    non-blocking client. PNG encoding and the file write run in threads.
+    """
+    import asyncio
+
+    try:
+        path, payload = await asyncio.to_thread(build_request, prompt, negative_prompt, input_image)
+
+        with timed(MODEL_SECONDS, model="stable_diffusion"):
+            response = await client.post(path, payload)
+
+        return await asyncio.to_thread(save_response, response, output_path)
+
+    except SDUnavailableError:
+        raise
 
     except Exception as e:
         raise RuntimeError(f"Generation failed: {str(e)}")
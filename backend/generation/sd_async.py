@@ -0,0 +1,107 @@
+import asyncio
+import random
+
+import httpx
+
+from generation import sd_client as sync_client
+from generation.sd_client import SDTimeoutError, SDUnavailableError
+from telemetry import get_logger
+
+logger = get_logger("sd_async")
+
+
+# --------------------------------------------------
+# Client settings (shared defaults with the sync client)
+# --------------------------------------------------
+MAX_CONNECTIONS = 512    # in-flight generations one process can hold
+
+
+class AsyncSDClient:
+    """
+    Non-blocking client for the SD backend pool.
+
+    Backend choice, in-flight counts, health and circuit breakers are shared
+    with the synchronous SDPool, so both serving modes see the same state.
+    """
+
+    def __init__(
+        self,
+        pool,
+        connect_timeout=sync_client.CONNECT_TIMEOUT,
+        read_timeout=sync_client.READ_TIMEOUT,
+        max_retries=sync_client.MAX_RETRIES,
+        max_connections=MAX_CONNECTIONS
+    ):
+        self.pool = pool
+        self.max_retries = max_retries
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections
+        )
+        self.client = None
+
+    def _http(self):
+        # Created lazily so it binds to the running event loop
+        if self.client is None:
+            self.client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def post(self, path, payload):
+        # Same routing and accounting as SDPool._call
+        for attempt in self.pool.attempts():
+            with attempt:
+                attempt.response = await self._post_with_retries(attempt.backend, path, payload)
+            if attempt.done:
+                return attempt.response
+
+    async def _post_with_retries(self, backend, path, payload):
+        breaker = backend.client.breaker
+        if not breaker.allow():
+            raise SDUnavailableError("sd_not_available: circuit open")
+
+        url = f"{backend.url.rstrip('/')}{path}"
+
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await self._http().post(url, json=payload)
+                except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                    # The request never reached the WebUI
+                    if attempt < self.max_retries:
+                        await self._backoff(attempt)
+                        continue
+                    breaker.record_failure()
+                    raise SDUnavailableError(f"sd_not_available: {e}")
+                except httpx.TimeoutException as e:
+                    # Read timeout: the WebUI may still be generating, so a retry
+                    # would queue the same GPU work again behind it
+                    breaker.record_failure()
+                    raise SDTimeoutError(f"sd_timeout: {e}")
+                except httpx.HTTPError as e:
+                    # ReadError, RemoteProtocolError, ...: not retried, but recorded
+                    breaker.record_failure()
+                    raise SDUnavailableError(f"sd_not_available: {e}")
+
+                if response.status_code in sync_client.RETRY_STATUSES:
+                    if attempt < self.max_retries:
+                        await self._backoff(attempt)
+                        continue
+                    breaker.record_failure()
+                    return response
+
+                breaker.record_success()
+                return response
+        except asyncio.CancelledError:
+            # Our request was cancelled; that says nothing about the backend
+            breaker.release_trial()
+            raise
+
+    async def _backoff(self, attempt):
+        delay = sync_client.BACKOFF_BASE * (2 ** attempt)
+        await asyncio.sleep(delay + random.uniform(0, delay))
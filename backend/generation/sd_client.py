@@ -0,0 +1,162 @@
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# --------------------------------------------------
+# Client settings
+# --------------------------------------------------
+CONNECT_TIMEOUT = 5      # seconds to establish the TCP connection
+READ_TIMEOUT = 180       # seconds to wait for a generation
+POOL_SIZE = 8            # keep-alive connections kept per host
+
+MAX_RETRIES = 2          # extra attempts on transient failures
+BACKOFF_BASE = 0.5       # seconds, doubled each retry (plus jitter)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+FAILURE_THRESHOLD = 3    # consecutive failures before the breaker opens
+RESET_TIMEOUT = 30       # seconds the breaker stays open before a trial call
+
+
+class SDUnavailableError(RuntimeError):
+    """Raised when the Stable Diffusion backend cannot be reached."""
+
+
+class SDTimeoutError(SDUnavailableError):
+    """Raised when the backend accepted a request but did not answer in time."""
+
+
+class CircuitBreaker:
+    """
+    closed    -> calls go through
+    open      -> calls fail fast until RESET_TIMEOUT has passed
+    half_open -> one trial call decides whether to close or re-open
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self.lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self.lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def release_trial(self):
+        """A trial call that ended without a verdict (e.g. cancelled)."""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class SDClient:
+    """
+    Persistent client for the Stable Diffusion WebUI API.
+
+    One requests.Session is shared by all threads: its urllib3 connection
+    pool is thread-safe and we do not rely on cookies.
+    """
+
+    def __init__(
+        self,
+        base_url,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        max_retries=MAX_RETRIES,
+        pool_size=POOL_SIZE,
+        breaker=None
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post(self, path, payload, timeout=None):
+        return self._request("POST", path, json=payload, timeout=timeout)
+
+    def get(self, path, timeout=None):
+        return self._request("GET", path, timeout=timeout)
+
+    def _request(self, method, path, timeout=None, **kwargs):
+        if not self.breaker.allow():
+            raise SDUnavailableError("sd_not_available: circuit open")
+
+        url = f"{self.base_url}{path}"
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.request(
+                    method, url, timeout=timeout or self.timeout, **kwargs
+                )
+            except requests.exceptions.ConnectionError as e:
+                # Includes ConnectTimeout: the request never reached the WebUI
+                if attempt < self.max_retries:
+                    self._backoff(attempt)
+                    continue
+                self.breaker.record_failure()
+                raise SDUnavailableError(f"sd_not_available: {e}")
+            except requests.exceptions.Timeout as e:
+                # Read timeout: the WebUI may still be generating, so a retry
+                # would queue the same GPU work again behind it
+                self.breaker.record_failure()
+                raise SDTimeoutError(f"sd_timeout: {e}")
+            except requests.exceptions.RequestException as e:
+                # e.g. ChunkedEncodingError when the WebUI drops mid-response;
+                # not retried, but the breaker must still hear about it
+                self.breaker.record_failure()
+                raise SDUnavailableError(f"sd_not_available: {e}")
+
+            if response.status_code in RETRY_STATUSES:
+                if attempt < self.max_retries:
+                    self._backoff(attempt)
+                    continue
+                self.breaker.record_failure()
+                return response
+
+            self.breaker.record_success()
+            return response
+
+    def _backoff(self, attempt):
+        delay = BACKOFF_BASE * (2 ** attempt)
+        time.sleep(delay + random.uniform(0, delay))
@@ -0,0 +1,240 @@
+import threading
+import time
+
+from generation.sd_client import SDClient, SDTimeoutError, SDUnavailableError
+from telemetry import get_logger, gauge, histogram, counter
+
+logger = get_logger("sd_pool")
+
+
+# --------------------------------------------------
+# Pool settings
+# --------------------------------------------------
+HEALTH_PATH = "/sdapi/v1/progress?skip_current_image=true"   # cheap, no GPU work
+HEALTH_TIMEOUT = (2, 3)
+TASK_PROGRESS_PATH = "/internal/progress"   # progress of one task, by force_task_id
+HEALTH_INTERVAL = 15      # seconds between background health checks
+LATENCY_EWMA_ALPHA = 0.2
+
+BACKEND_IN_FLIGHT = gauge(
+    "wastetoart_sd_backend_in_flight", "Generations in flight per SD backend", ["backend"]
+)
+BACKEND_SECONDS = histogram(
+    "wastetoart_sd_backend_seconds", "Generation latency per SD backend", ["backend"]
+)
+BACKEND_FAILURES = counter(
+    "wastetoart_sd_backend_failures_total", "Failed calls per SD backend", ["backend"]
+)
+
+
+class SDBackend:
+
+    def __init__(self, url, client=None):
+        self.url = url
+        self.client = client or SDClient(url)
+        self.healthy = True
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.latency_ewma = None
+        self.last_latency = None
+        self.lock = threading.Lock()
+
+    def available(self):
+        return self.healthy and self.client.breaker.state != "open"
+
+    def begin(self):
+        with self.lock:
+            self.in_flight += 1
+            self.requests += 1
+        BACKEND_IN_FLIGHT.inc(backend=self.url)
+
+    def end(self, elapsed, ok):
+        with self.lock:
+            self.in_flight -= 1
+            if ok:
+                self.last_latency = elapsed
+                if self.latency_ewma is None:
+                    self.latency_ewma = elapsed
+                else:
+                    self.latency_ewma += LATENCY_EWMA_ALPHA * (elapsed - self.latency_ewma)
+            else:
+                # Not marked unhealthy here: only check() sets that back, and
+                # it may not be running. The client's breaker opens after
+                # repeated failures and lets a trial call through later.
+                self.failures += 1
+        BACKEND_IN_FLIGHT.dec(backend=self.url)
+        if ok:
+            BACKEND_SECONDS.observe(elapsed, backend=self.url)
+        else:
+            BACKEND_FAILURES.inc(backend=self.url)
+
+    def check(self):
+        try:
+            response = self.client.session.get(
+                f"{self.client.base_url}{HEALTH_PATH}", timeout=HEALTH_TIMEOUT
+            )
+            ok = response.status_code == 200
+        except Exception:
+            ok = False
+
+        if ok != self.healthy:
+            logger.info("SD backend %s is now %s", self.url, "healthy" if ok else "unhealthy")
+        self.healthy = ok
+        if ok:
+            self.client.breaker.record_success()
+        return ok
+
+    def task_progress(self, task_id, live_preview_id=-1):
+        """
+        WebUI progress of the task submitted with force_task_id=task_id;
+        the preview is only sent when newer than live_preview_id. Returns
+        None when the backend does not answer.
+        """
+        try:
+            response = self.client.session.post(
+                f"{self.client.base_url}{TASK_PROGRESS_PATH}",
+                json={"id_task": task_id, "id_live_preview": live_preview_id, "live_preview": True},
+                timeout=HEALTH_TIMEOUT
+            )
+            if response.status_code == 200:
+                return response.json()
+        except Exception:
+            pass
+        return None
+
+    def stats(self):
+        with self.lock:
+            return {
+                "url": self.url,
+                "healthy": self.healthy,
+                "breaker": self.client.breaker.state,
+                "in_flight": self.in_flight,
+                "requests": self.requests,
+                "failures": self.failures,
+                "latency_ewma_s": self.latency_ewma,
+                "last_latency_s": self.last_latency
+            }
+
+
+class Attempt:
+    """
+    One call to one backend, used as a context manager around the call so
+    the backend's in-flight count and latency are recorded however it ends.
+    Connection failures are swallowed (the caller fails over); timeouts and
+    anything unexpected propagate.
+    """
+
+    def __init__(self, backend, last):
+        self.backend = backend
+        self.last = last          # no other backend left to fail over to
+        self.response = None
+        self.start = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ok = exc_type is None and self.response.status_code < 500
+        self.backend.end(time.perf_counter() - self.start, ok=ok)
+
+        # SDTimeoutError: the backend may still be generating; don't submit it twice
+        if exc_type is not None and issubclass(exc_type, SDUnavailableError) \
+                and not issubclass(exc_type, SDTimeoutError):
+            logger.warning("SD backend %s failed, trying next", self.backend.url)
+            return True
+        return False
+
+    @property
+    def done(self):
+        """True when response should be returned (a success, or the last backend's error)."""
+        return self.response is not None and (self.response.status_code < 500 or self.last)
+
+
+class SDPool:
+    """
+    Routes each generation to the least-loaded healthy SD backend.
+
+    Same post()/get() interface as SDClient. A backend is skipped while its
+    circuit breaker is open, and while the background health check (if
+    started) cannot reach it.
+    """
+
+    def __init__(self, urls):
+        self.backends = [SDBackend(url) for url in urls]
+        self.checker = None
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+
+    def pick(self, exclude=()):
+        with self.lock:
+            candidates = [
+                b for b in self.backends
+                if b.available() and b not in exclude
+            ]
+            if not candidates:
+                return None
+
+            # Fewest in-flight first, then the historically faster node
+            backend = min(
+                candidates,
+                key=lambda b: (b.in_flight, b.latency_ewma or 0.0)
+            )
+            backend.begin()
+            return backend
+
+    def post(self, path, payload, timeout=None, on_route=None):
+        """on_route(backend) is called with each backend the request is sent to."""
+        return self._call("post", path, payload, timeout=timeout, on_route=on_route)
+
+    def get(self, path, timeout=None):
+        return self._call("get", path, timeout=timeout)
+
+    def attempts(self, on_route=None):
+        """
+        Yields an Attempt per backend, least-loaded first, until the caller
+        stops; raises SDUnavailableError when no backend is left to try.
+        """
+        tried = []
+
+        while True:
+            backend = self.pick(exclude=tried)
+            if backend is None:
+                raise SDUnavailableError("sd_not_available: no healthy SD backends")
+            tried.append(backend)
+            if on_route is not None:
+                on_route(backend)
+            yield Attempt(backend, last=len(tried) == len(self.backends))
+
+    def _call(self, method, path, *args, on_route=None, **kwargs):
+        for attempt in self.attempts(on_route):
+            with attempt:
+                attempt.response = getattr(attempt.backend.client, method)(path, *args, **kwargs)
+            if attempt.done:
+                return attempt.response
+
+    # -------------------------------
+    # Health checks
+    # -------------------------------
+    def check_all(self):
+        for backend in self.backends:
+            backend.check()
+
+    def start_health_checks(self, interval=HEALTH_INTERVAL):
+        if self.checker is not None:
+            return self.checker
+
+        def _loop():
+            while not self.stop_event.is_set():
+                self.check_all()
+                self.stop_event.wait(interval)
+
+        self.checker = threading.Thread(target=_loop, name="sd-health", daemon=True)
+        self.checker.start()
+        return self.checker
+
+    def stop_health_checks(self):
+        self.stop_event.set()
+
+    def stats(self):
+        return [b.stats() for b in self.backends]
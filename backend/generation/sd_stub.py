@@ -0,0 +1,137 @@
+"""
+Minimal stand-in for the Stable Diffusion WebUI API.
+
+Speaks /sdapi/v1/txt2img and /sdapi/v1/img2img and returns a tiny PNG,
+so the generation path can be exercised without a GPU. /sdapi/v1/progress
+reports simulated sampling steps for whichever request is running;
+/internal/progress reports one request by its force_task_id.
+
+    python backend/generation/sd_stub.py --port 7860 --latency 0.5
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# 1x1 transparent PNG
+STUB_PNG_B64 = (
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk"
+    "YPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+
+STUB_STEPS = 20
+
+
+def make_handler(latency=0.0, failure_rate=0.0):
+    running = {}   # task id -> start time of generations in progress
+
+    class StubHandler(BaseHTTPRequestHandler):
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            payload = json.loads(body or b"{}")
+
+            if self.path == "/internal/progress":
+                return self._send(200, self._task_progress(payload))
+
+            if self.path not in ("/sdapi/v1/txt2img", "/sdapi/v1/img2img"):
+                return self._send(404, {"detail": "Not Found"})
+
+            task_id = payload.get("force_task_id") or f"task({uuid.uuid4().hex})"
+            running[task_id] = time.monotonic()
+            try:
+                time.sleep(latency)
+            finally:
+                running.pop(task_id, None)
+
+            if random.random() < failure_rate:
+                return self._send(503, {"detail": "stub failure"})
+
+            return self._send(200, {
+                "images": [STUB_PNG_B64],
+                "parameters": {k: v for k, v in payload.items() if k != "init_images"},
+                "info": "{}"
+            })
+
+        def do_GET(self):
+            if self.path.startswith("/sdapi/v1/progress"):
+                return self._send(200, self._progress())
+            if self.path == "/sdapi/v1/options":
+                return self._send(200, {})
+            return self._send(404, {"detail": "Not Found"})
+
+        def _progress(self):
+            if not running or latency <= 0:
+                return {
+                    "progress": 0.0,
+                    "eta_relative": 0.0,
+                    "state": {"sampling_step": 0, "sampling_steps": 0},
+                    "current_image": None
+                }
+
+            elapsed = time.monotonic() - min(running.values())
+            progress = min(elapsed / latency, 1.0)
+            step = int(progress * STUB_STEPS)
+            with_image = "skip_current_image=true" not in self.path and step > 0
+            return {
+                "progress": progress,
+                "eta_relative": max(latency - elapsed, 0.0),
+                "state": {"sampling_step": step, "sampling_steps": STUB_STEPS},
+                "current_image": STUB_PNG_B64 if with_image else None
+            }
+
+        def _task_progress(self, request):
+            started = running.get(request.get("id_task"))
+            if started is None or latency <= 0:
+                return {
+                    "active": False, "queued": False, "completed": started is None,
+                    "progress": None, "eta": None,
+                    "live_preview": None, "id_live_preview": -1, "textinfo": None
+                }
+
+            elapsed = time.monotonic() - started
+            progress = min(elapsed / latency, 1.0)
+            step = int(progress * STUB_STEPS)
+            # Like the WebUI: a preview only when newer than the client's
+            newer = request.get("live_preview") and step > request.get("id_live_preview", -1)
+            return {
+                "active": True, "queued": False, "completed": False,
+                "progress": progress,
+                "eta": max(latency - elapsed, 0.0),
+                "live_preview": f"data:image/png;base64,{STUB_PNG_B64}" if newer and step > 0 else None,
+                "id_live_preview": step,
+                "textinfo": None
+            }
+
+        def _send(self, status, data):
+            raw = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def serve(port=7860, latency=0.0, failure_rate=0.0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, failure_rate))
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub Stable Diffusion WebUI API")
+    parser.add_argument("--port", type=int, default=7860)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    print(f"Stub SD API on http://127.0.0.1:{args.port}")
+    serve(args.port, args.latency, args.failure_rate).serve_forever()
@@ -0,0 +1,54 @@
+import hashlib
+
+import cv2
+import numpy as np
+
+
+class IngestedImage:
+    """
+    An upload decoded exactly once.
+
+    `data` is the original compressed bytes, `image` the decoded BGR array
+    shared by YOLO, crop extraction and the img2img payload, and `sha256`
+    the content hash used by the result cache.
+    """
+
+    def __init__(self, data, image, path=None):
+        self.data = data
+        self.image = image
+        self.path = path
+        self.sha256 = hashlib.sha256(data).hexdigest()
+
+    def persist(self, path):
+        """Writes the original bytes to disk (no re-encode) and returns the path."""
+        if self.path is None:
+            self.path = path
+            with open(self.path, "wb") as f:
+                f.write(self.data)
+        return self.path
+
+
+def decode_image(data):
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Uploaded file is not a readable image")
+    return image
+
+
+def ingest_bytes(data):
+    return IngestedImage(data, decode_image(data))
+
+
+def ingest_path(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    return IngestedImage(data, decode_image(data), path=path)
+
+
+def as_ingested(input_image):
+    """Accepts an IngestedImage, raw image bytes or a file path."""
+    if isinstance(input_image, IngestedImage):
+        return input_image
+    if isinstance(input_image, (bytes, bytearray)):
+        return ingest_bytes(bytes(input_image))
+    return ingest_path(input_image)
@@ -0,0 +1,82 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from telemetry import get_logger
+
+logger = get_logger("jobs")
+
+
+# -------------------------------
+# Job queue settings
+# -------------------------------
+MAX_WORKERS = 2          # concurrent pipeline runs
+MAX_FINISHED_JOBS = 500  # finished jobs kept for polling before being dropped
+
+
+class JobManager:
+    """
+    Runs pipeline calls on a bounded worker pool and keeps their status
+    so clients can poll for the result instead of holding a connection.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_finished=MAX_FINISHED_JOBS):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="pipeline-job"
+        )
+        self.max_finished = max_finished
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        job_id = uuid.uuid4().hex
+
+        with self.lock:
+            self.jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "created_at": time.time(),
+                "finished_at": None,
+                "result": None,
+                "error": None
+            }
+
+        self.executor.submit(self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _run(self, job_id, fn, args, kwargs):
+        self._update(job_id, status="running")
+
+        try:
+            result = fn(*args, **kwargs)
+            self._update(job_id, status="done", result=result)
+        except Exception as e:
+            logger.error("❌ JOB ERROR: %s", str(e))
+            self._update(job_id, status="failed", error=str(e))
+
+    def _update(self, job_id, **fields):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+
+            job.update(fields)
+            if fields.get("status") in ("done", "failed"):
+                job["finished_at"] = time.time()
+                self._prune()
+
+    def _prune(self):
+        finished = [
+            job_id for job_id, job in self.jobs.items()
+            if job["status"] in ("done", "failed")
+        ]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
@@ -0,0 +1,281 @@
+"""
+Client side of the shared model server (see model_server.py).
+
+When WASTETOART_MODEL_SERVER is set, the "yolo" and "classifier" registry
+loaders return the proxies below instead of loading torch / TensorFlow in
+this process. Pixel data travels through shared memory; only shapes,
+boxes and scores are pickled over the connection.
+
+Connections are authenticated with a shared key (see load_authkey);
+anyone holding it can make the server unpickle arbitrary data.
+"""
+import atexit
+import os
+import secrets
+import threading
+from multiprocessing import AuthenticationError, shared_memory
+from multiprocessing.connection import Client
+
+import cv2
+import numpy as np
+
+from storage import STORAGE_ROOT
+from telemetry import get_logger
+
+logger = get_logger("model_client")
+
+
+# -------------------------------
+# Model server settings
+# -------------------------------
+# "host:port", a Unix socket path or a Windows pipe name; unset = load models in-process
+MODEL_SERVER = os.environ.get("WASTETOART_MODEL_SERVER")
+
+# Connection key; when unset, model_server.py generates one into KEY_FILE
+# (owner-only) and workers on the same host read it from there
+AUTHKEY_ENV = "WASTETOART_MODEL_SERVER_KEY"
+KEY_FILE = os.path.join(STORAGE_ROOT, "cache", "model_server.key")
+
+DEFAULT_ADDRESS = "127.0.0.1:6001"
+MIN_BUFFER_BYTES = 8 * 1024 * 1024
+# Channels (connection + shared-memory buffer) kept for reuse between calls
+MAX_IDLE_CHANNELS = 4
+ALIGNMENT = 64
+
+
+class ModelServerError(RuntimeError):
+    pass
+
+
+def load_authkey(create=False):
+    """
+    WASTETOART_MODEL_SERVER_KEY if set, else the key file. With create=True
+    (the server) a random key is written to the file if there is none.
+    """
+    key = os.environ.get(AUTHKEY_ENV)
+    if key:
+        return key.encode("utf-8")
+
+    try:
+        with open(KEY_FILE, "rb") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        if not create:
+            raise ModelServerError(
+                f"no model server key: set {AUTHKEY_ENV} or start model_server.py first"
+            )
+
+    os.makedirs(os.path.dirname(KEY_FILE), exist_ok=True)
+    key = secrets.token_hex(32).encode("utf-8")
+    fd = os.open(KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    logger.info("🔑 Generated model server key in %s", KEY_FILE)
+    return key
+
+
+def parse_address(address):
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and os.sep not in address:
+        return (host or "127.0.0.1", int(port))
+    return address
+
+
+# -------------------------------
+# Shared-memory pixel buffers
+# -------------------------------
+def pack_arrays(shm, arrays):
+    """Copies arrays into shm back to back; returns their (offset, shape, dtype) specs."""
+    specs, offset = [], 0
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf, offset=offset)
+        view[...] = arr
+        specs.append((offset, arr.shape, arr.dtype.str))
+        offset += -(-arr.nbytes // ALIGNMENT) * ALIGNMENT
+    return specs
+
+
+def packed_size(arrays):
+    return sum(-(-np.asarray(a).nbytes // ALIGNMENT) * ALIGNMENT for a in arrays)
+
+
+class _Channel:
+    """A connection plus the shared-memory buffer its requests are packed into."""
+
+    def __init__(self):
+        self.conn = None
+        self.shm = None
+
+    def buffer(self, nbytes):
+        shm = self.shm
+        if shm is not None and shm.size >= nbytes:
+            return shm
+
+        size = max(nbytes, MIN_BUFFER_BYTES, 2 * shm.size if shm else 0)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        if shm is not None:
+            _unlink(shm)
+        return self.shm
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except OSError:
+                pass
+            self.conn = None
+        if self.shm is not None:
+            _unlink(self.shm)
+            self.shm = None
+
+
+def _unlink(shm):
+    try:
+        shm.close()
+        shm.unlink()
+    except OSError:
+        pass
+
+
+class ModelServerClient:
+    """
+    Each call checks a channel (connection + shared-memory buffer) out of a
+    small pool and returns it afterwards, so concurrent requests in a worker
+    never wait on each other here (the server batches them), while threads
+    that come and go (one per Flask request / SSE stream) reuse at most
+    MAX_IDLE_CHANNELS segments instead of leaving one each behind.
+    """
+
+    def __init__(self, address=None, authkey=None):
+        self.address = parse_address(address or MODEL_SERVER or DEFAULT_ADDRESS)
+        self.authkey = authkey
+        self.idle = []
+        self.lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _checkout(self):
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+        return _Channel()
+
+    def _return(self, channel):
+        with self.lock:
+            if len(self.idle) < MAX_IDLE_CHANNELS:
+                self.idle.append(channel)
+                return
+        channel.close()
+
+    def _connect(self, channel):
+        if channel.conn is None:
+            try:
+                channel.conn = Client(self.address, authkey=self.authkey or load_authkey())
+            except (OSError, AuthenticationError) as e:
+                raise ModelServerError(f"model server unavailable at {self.address}: {e}")
+        return channel.conn
+
+    def call(self, op, arrays=(), **fields):
+        channel = self._checkout()
+        try:
+            reply = self._send(channel, op, arrays, fields)
+        except BaseException:
+            # The connection may hold half a message; never reuse it
+            channel.close()
+            raise
+        self._return(channel)
+
+        if not reply.get("ok"):
+            raise ModelServerError(reply.get("error", "model server error"))
+        return reply
+
+    def _send(self, channel, op, arrays, fields):
+        message = dict(fields, op=op)
+        if arrays:
+            shm = channel.buffer(packed_size(arrays))
+            message["shm"] = shm.name
+            message["arrays"] = pack_arrays(shm, arrays)
+
+        for attempt in (0, 1):
+            conn = self._connect(channel)
+            try:
+                conn.send(message)
+                return conn.recv()
+            except (EOFError, OSError) as e:
+                # Server restarted: reconnect once, then give up
+                channel.conn = None
+                if attempt:
+                    raise ModelServerError(f"model server connection lost: {e}")
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for channel in idle:
+            channel.close()
+
+
+# -------------------------------
+# Model proxies (same call interface as the local models)
+# -------------------------------
+class RemoteBox:
+    def __init__(self, cls_id, conf, xyxy):
+        self.cls = np.array([cls_id])
+        self.conf = np.array([conf])
+        self.xyxy = np.array([xyxy], dtype=np.float32)
+
+
+class RemoteResults:
+    def __init__(self, orig_img, boxes, names):
+        self.orig_img = orig_img
+        self.boxes = boxes
+        self.names = names
+
+
+class RemoteDetector:
+    """Called like the ultralytics model: model(image) or model([images])."""
+
+    def __init__(self, client):
+        self.client = client
+        client.call("status")   # fail the registry load if the server is down
+
+    def __call__(self, source):
+        sources = source if isinstance(source, list) else [source]
+        images = [cv2.imread(s) if isinstance(s, str) else s for s in sources]
+
+        reply = self.client.call("detect", arrays=images)
+        return [
+            RemoteResults(img, [RemoteBox(*box) for box in boxes], reply["names"])
+            for img, boxes in zip(images, reply["boxes"])
+        ]
+
+
+class RemoteClassifier:
+    """Called like the Keras / TFLite classifier: model.predict(batch)."""
+
+    def __init__(self, client):
+        self.client = client
+        client.call("status")
+
+    def predict(self, batch, verbose=0):
+        batch = np.asarray(batch, dtype=np.float32)
+        return self.client.call("classify", arrays=[batch])["predictions"]
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ModelServerClient()
+        return _client
+
+
+def remote_detector():
+    return RemoteDetector(get_client())
+
+
+def remote_classifier():
+    return RemoteClassifier(get_client())
@@ -0,0 +1,263 @@
+"""
+Shared inference process for multi-worker deployments.
+
+Owns YOLO and the biodegradability CNN so web workers don't each load
+torch and TensorFlow. Workers connect with model_client.py
+(WASTETOART_MODEL_SERVER=<address>); requests that arrive together from
+different workers are run as one batch.
+
+    python backend/model_server.py --address 127.0.0.1:6001
+    WASTETOART_MODEL_SERVER=127.0.0.1:6001 python backend/server.py
+
+Messages are pickled, so the connection key is what stands between a
+client and code execution here. Without WASTETOART_MODEL_SERVER_KEY a
+random key is generated into an owner-only file that local workers read;
+listening on a non-loopback address requires the variable to be set.
+"""
+import argparse
+import ipaddress
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Listener
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import model_client
+from model_client import AUTHKEY_ENV, DEFAULT_ADDRESS, load_authkey, parse_address
+from registry import registry
+from telemetry import get_logger
+
+logger = get_logger("model_server")
+
+
+# -------------------------------
+# Batching settings
+# -------------------------------
+BATCH_WINDOW = 0.005      # seconds to wait for other workers' requests
+MAX_DETECT_BATCH = 16     # images per YOLO call
+MAX_CLASSIFY_BATCH = 64   # crops per CNN call
+
+MODELS = ["yolo", "classifier"]
+
+# Pending connections (the Listener default of 1 stalls concurrent workers)
+LISTEN_BACKLOG = 128
+
+
+# -------------------------------
+# Shared memory
+# -------------------------------
+def read_arrays(name, specs):
+    """Copies the client's arrays out of its shared-memory buffer."""
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == "posix":
+        # The client owns (and unlinks) the buffer; don't let our tracker do it
+        resource_tracker.unregister(shm._name, "shared_memory")
+    try:
+        return [
+            np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset).copy()
+            for offset, shape, dtype in specs
+        ]
+    finally:
+        shm.close()
+
+
+# -------------------------------
+# Cross-worker batching
+# -------------------------------
+class Batcher:
+    """
+    Collects requests for one model for up to BATCH_WINDOW and runs them
+    in a single call. run_batch maps a list of items to a list of results.
+    """
+
+    def __init__(self, name, run_batch, max_items, window=BATCH_WINDOW):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_items = max_items
+        self.window = window
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.items = 0
+        threading.Thread(target=self._loop, name=f"batch-{name}", daemon=True).start()
+
+    def submit(self, items):
+        future = Future()
+        self.queue.put((items, future))
+        return future
+
+    def _loop(self):
+        while True:
+            pending = [self.queue.get()]
+            count = len(pending[0][0])
+            deadline = time.monotonic() + self.window
+
+            while count < self.max_items:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(request)
+                count += len(request[0])
+
+            self._run(pending)
+
+    def _run(self, pending):
+        items = [item for request_items, _ in pending for item in request_items]
+
+        try:
+            results = self.run_batch(items)
+        except Exception as e:
+            logger.exception("❌ %s batch failed: %s", self.name, str(e))
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.items += len(items)
+        logger.debug("%s batch: %d item(s) from %d request(s)", self.name, len(items), len(pending))
+
+        offset = 0
+        for request_items, future in pending:
+            future.set_result(results[offset:offset + len(request_items)])
+            offset += len(request_items)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": self.items / self.batches if self.batches else None
+        }
+
+
+def detect_batch(images):
+    results = registry.get("yolo")(images)
+    return [
+        (
+            [(int(box.cls[0]), float(box.conf[0]), box.xyxy[0].tolist()) for box in r.boxes],
+            {int(box.cls[0]): r.names[int(box.cls[0])] for box in r.boxes}
+        )
+        for r in results
+    ]
+
+
+def classify_batch(crops):
+    predictions = registry.get("classifier").predict(np.stack(crops), verbose=0)
+    return list(np.asarray(predictions))
+
+
+# -------------------------------
+# Connections
+# -------------------------------
+class ModelServer:
+
+    def __init__(self, address, authkey=None):
+        self.address = address
+        self.authkey = authkey or load_authkey(create=True)
+        self.detector = Batcher("yolo", detect_batch, MAX_DETECT_BATCH)
+        self.classifier = Batcher("classifier", classify_batch, MAX_CLASSIFY_BATCH)
+
+    def handle(self, message):
+        op = message.get("op")
+
+        if op == "status":
+            return {
+                "ok": True,
+                "models": registry.status(),
+                "batches": {"yolo": self.detector.stats(), "classifier": self.classifier.stats()}
+            }
+
+        arrays = read_arrays(message["shm"], message["arrays"])
+
+        if op == "detect":
+            per_image = self.detector.submit(arrays).result()
+            names = {}
+            for _, image_names in per_image:
+                names.update(image_names)
+            return {"ok": True, "boxes": [boxes for boxes, _ in per_image], "names": names}
+
+        if op == "classify":
+            crops = list(arrays[0])
+            predictions = self.classifier.submit(crops).result()
+            return {"ok": True, "predictions": np.asarray(predictions).reshape(len(crops), -1)}
+
+        return {"ok": False, "error": f"Unknown op: {op}"}
+
+    def serve_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+
+                try:
+                    reply = self.handle(message)
+                except Exception as e:
+                    reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+                try:
+                    conn.send(reply)
+                except OSError:
+                    return
+
+    def serve_forever(self):
+        with Listener(self.address, backlog=LISTEN_BACKLOG, authkey=self.authkey) as listener:
+            logger.info("🧠 Model server listening on %s", self.address)
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    # Bad authkey or a client that hung up mid-handshake
+                    logger.warning("Rejected model server connection: %s", str(e))
+                    continue
+
+                threading.Thread(
+                    target=self.serve_connection, args=(conn,),
+                    name="model-conn", daemon=True
+                ).start()
+
+
+def is_loopback(address):
+    """Unix sockets and Windows pipes are local; TCP only on a loopback host."""
+    if not isinstance(address, tuple):
+        return True
+    host = address[0]
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared YOLO / classifier inference process")
+    parser.add_argument("--address", default=model_client.MODEL_SERVER or DEFAULT_ADDRESS)
+    args = parser.parse_args()
+
+    address = parse_address(args.address)
+    if not is_loopback(address) and not os.environ.get(AUTHKEY_ENV):
+        parser.error(f"set {AUTHKEY_ENV} to a long random secret to listen on {args.address}")
+
+    # This process is the one that loads the real models
+    model_client.MODEL_SERVER = None
+
+    import detection.detect   # noqa: F401  (registers "yolo")
+    import classification.classify   # noqa: F401  (registers "classifier")
+
+    registry.warm_up(MODELS, background=False)
+    ModelServer(address).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
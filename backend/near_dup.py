@@ -0,0 +1,239 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+from telemetry import get_logger, counter
+from storage import STORAGE_ROOT
+
+logger = get_logger("near_dup")
+
+
+# -------------------------------
+# Near-duplicate index settings
+# -------------------------------
+INDEX_PATH = os.path.join(STORAGE_ROOT, "cache", "near_dup_index.jsonl")
+
+MAX_DISTANCE = 4       # Hamming distance (of 64 bits) that counts as "same photo"
+MAX_ENTRIES = 5000
+COMPACT_SLACK = 0.1    # rewrite the log once it holds 10% more lines than entries
+
+LOOKUPS = counter(
+    "wastetoart_near_dup_lookups_total", "Perceptual-hash index lookups", ["outcome"]
+)
+
+
+# -------------------------------
+# Perceptual hash
+# -------------------------------
+def dhash(image, size=8):
+    """64-bit difference hash of a BGR image (robust to re-encoding / resizing)."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+# -------------------------------
+# Inter-process lock
+# -------------------------------
+@contextmanager
+def file_lock(path):
+    """Exclusive lock shared by all worker processes using the same index."""
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+# -------------------------------
+# BK-tree (metric tree for Hamming distance)
+# -------------------------------
+class BKTree:
+
+    def __init__(self):
+        self.root = None   # [hash, [entry ids], {distance: child}]
+        self.size = 0
+
+    def add(self, value, entry_id):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [entry_id], {}]
+            return
+
+        node = self.root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].append(entry_id)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, [entry_id], {}]
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """Returns (distance, entry_id) pairs within max_distance, closest first."""
+        found = []
+        stack = [self.root] if self.root else []
+
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= max_distance:
+                found.extend((d, entry_id) for entry_id in node[1])
+
+            # Triangle inequality: only children in [d - r, d + r] can match
+            for child_d, child in node[2].items():
+                if d - max_distance <= child_d <= d + max_distance:
+                    stack.append(child)
+
+        found.sort(key=lambda x: x[0])
+        return found
+
+
+# -------------------------------
+# Persistent, size-bounded index
+# -------------------------------
+class NearDuplicateIndex:
+    """
+    Remembers the detections and labels of processed uploads, keyed by
+    perceptual hash, so a re-shot or re-encoded photo can skip straight
+    to prompt building.
+
+    Stored as an append-only JSON-lines log that is compacted when it
+    grows past MAX_ENTRIES; the BK-tree is rebuilt from it at start-up.
+    Several server workers may share the log: appends and compaction
+    happen under a file lock, and compaction re-reads the log so entries
+    other workers appended are kept.
+    """
+
+    def __init__(self, path=INDEX_PATH, max_entries=MAX_ENTRIES, max_distance=MAX_DISTANCE):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+
+        self.entries = {}      # id -> entry, insertion (oldest first) order
+        self.tree = BKTree()
+        self.log_lines = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._load()
+
+    def lookup(self, phash, options_key):
+        with self.lock:
+            for distance, entry_id in self.tree.search(phash, self.max_distance):
+                entry = self.entries.get(entry_id)
+                if entry is not None and entry["options_key"] == options_key:
+                    LOOKUPS.inc(outcome="hit")
+                    return entry, distance
+
+        LOOKUPS.inc(outcome="miss")
+        return None, None
+
+    def add(self, phash, options_key, detections, reasoning):
+        entry = {
+            "id": uuid.uuid4().hex,
+            "hash": phash,
+            "options_key": options_key,
+            "created_at": time.time(),
+            "detections": [
+                {k: det.get(k) for k in ("class", "conf", "bbox", "biodeg_label", "label_source")}
+                for det in detections
+            ],
+            "reasoning": reasoning
+        }
+
+        with self.lock, file_lock(self.lock_path):
+            self._insert(entry)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self.log_lines += 1
+
+            if (len(self.entries) > self.max_entries
+                    or self.log_lines > self.max_entries * (1 + COMPACT_SLACK)):
+                self._compact()
+
+        return entry["id"]
+
+    # -------------------------------
+    # Internals
+    # -------------------------------
+    def _insert(self, entry):
+        self.entries[entry["id"]] = entry
+        self.tree.add(entry["hash"], entry["id"])
+
+    def _read_log(self):
+        """(entries, line count) as currently on disk, oldest first."""
+        entries, lines = {}, 0
+        if not os.path.exists(self.path):
+            return entries, lines
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue   # torn write from a crash
+                entries[entry["id"]] = entry
+        return entries, lines
+
+    def _load(self):
+        self.entries, self.log_lines = self._read_log()
+
+        if len(self.entries) > self.max_entries:
+            with file_lock(self.lock_path):
+                self._compact()
+        else:
+            self._rebuild_tree()
+
+        logger.info("Loaded %d near-duplicate entries", len(self.entries))
+
+    def _compact(self):
+        """Rewrites the log without evicted / duplicate lines. Caller holds the file lock."""
+        # Start from the log, not our view: other workers may have appended
+        self.entries, _ = self._read_log()
+
+        if len(self.entries) > self.max_entries:
+            # Drop the oldest entries in one go; BK-trees have no cheap delete
+            keep = int(self.max_entries * (1 - COMPACT_SLACK))
+            for entry_id in list(self.entries)[:len(self.entries) - keep]:
+                del self.entries[entry_id]
+
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
+        self.log_lines = len(self.entries)
+        self._rebuild_tree()
+
+    def _rebuild_tree(self):
+        self.tree = BKTree()
+        for entry in self.entries.values():
+            self.tree.add(entry["hash"], entry["id"])
@@ -1,12 +1,23 @@
-import sys, os, uuid
+import sys, os, uuid, logging, copy, json
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from detection.detect import run_detection
-from classification.classify import predict_class
+from detection.detect import run_detection, run_detections
+from classification.classify import classify_with_yolo_mapping
 import prompt.prompt_builder as pb
-print("PROMPT BUILDER FILE:", pb.__file__)
-from prompt.prompt_builder import build_prompt
-from generation.generate_art import generate_art
+from prompt.prompt_builder import build_prompt, sanitize_user_text
+from generation.generate_art import generate_art, generate_art_async
+from cache import ResultCache
+from ingest import as_ingested
+from storage import storage
+from near_dup import NearDuplicateIndex, dhash
+from admission import admission
+from telemetry import (
+    get_logger, span, set_request_id, current_request_id,
+    DETECTIONS, REQUESTS, SD_FAILURES
+)
+
+logger = get_logger("pipeline")
+logger.debug("PROMPT BUILDER FILE: %s", pb.__file__)
 
 
 # -------------------------------
@@ -26,33 +37,401 @@ ALLOWED_WASTE_CLASSES = {
 }
 
 
+# -------------------------------
+# End-to-end result cache
+# -------------------------------
+result_cache = ResultCache()
+
+
+def cache_options(style, mood, user_notes, user_art_target):
+    # Normalize only in ways that cannot change the generated prompt
+    return {
+        "style": style or None,
+        "mood": mood or None,
+        "notes": sanitize_user_text(user_notes),
+        "art_target": user_art_target or None
+    }
+
+
+# -------------------------------
+# Near-duplicate reuse (perceptual hash)
+# -------------------------------
+near_dup_index = NearDuplicateIndex()
+
+
+def options_key(style, mood, user_notes, user_art_target):
+    return json.dumps(cache_options(style, mood, user_notes, user_art_target), sort_keys=True)
+
+
+def reuse_near_duplicate(phash, key):
+    """
+    Returns (detections, reasoning) stored for a near-identical upload with
+    the same options, or (None, None).
+    """
+    entry, distance = near_dup_index.lookup(phash, key)
+    if entry is None:
+        return None, None
+
+    logger.info("♻ Near-duplicate upload (distance %d) — reusing detections", distance)
+
+    reasoning = copy.deepcopy(entry["reasoning"])
+    reasoning["near_duplicate"] = {"entry": entry["id"], "distance": distance}
+    detections = [dict(det) for det in entry["detections"]]
+    return detections, reasoning
+
+
+def cached_result(ingested, style, mood, user_notes, user_art_target, use_cache):
+    """
+    Returns (cache_key, cached_result). Both are None when caching is off.
+    """
+    if not use_cache:
+        return None, None
+
+    cache_key = result_cache.make_key(
+        ingested.sha256,
+        cache_options(style, mood, user_notes, user_art_target)
+    )
+    cached = result_cache.get(cache_key)
+
+    if cached is not None:
+        logger.info("♻ Cache hit — reusing stored result")
+        REQUESTS.inc(outcome="cache_hit")
+
+    return cache_key, cached
+
+
+def finalize_result(result, output_path, cache_key, return_path):
+    REQUESTS.inc(outcome=result["error"].lower() if "error" in result else result["generation_status"])
+
+    # Only cache deterministic outcomes (not SD outages)
+    if cache_key and ("error" in result or result["generation_status"] == "success"):
+        result_cache.put(cache_key, result)
+
+    if return_path or "error" in result:
+        return result
+
+    return output_path
+
+
+def response_payload(result):
+    """Shape of a /process response (shared by the Flask and async servers)."""
+    # -----------------------------
+    # Handle pipeline error cases
+    # -----------------------------
+    if isinstance(result, dict) and "error" in result:
+        return result
+
+    # -----------------------------
+    # Success response
+    # -----------------------------
+    return {
+        "image_path": result.get("image_path"),
+        "generation_status": result.get("generation_status"),
+        "prompt": result.get("prompt"),
+        "negative_prompt": result.get("negative_prompt"),
+        "reasoning": result.get("reasoning")
+    }
+
+
 def process_image(
     input_image,
     return_path=False,
     style=None,
     mood=None,
     user_notes=None,
-    user_art_target=None
+    user_art_target=None,
+    use_cache=True,
+    request_id=None,
+    use_near_dup=True,
+    progress=None
+):
+    """
+    input_image: file path, raw image bytes or an IngestedImage.
+    The image is decoded once and shared by every stage.
+    request_id: tags logs and spans; a new one is made if none is bound.
+    use_near_dup: reuse detections / labels of a near-identical earlier upload.
+    progress: optional callable(event, data), called as each stage finishes
+    ("detections", "labels", "prompt", "generation", "sampling").
+    """
+    cache_key, cached, error, plan = plan_image(
+        input_image,
+        style=style,
+        mood=mood,
+        user_notes=user_notes,
+        user_art_target=user_art_target,
+        use_cache=use_cache,
+        request_id=request_id,
+        use_near_dup=use_near_dup,
+        progress=progress
+    )
+
+    if cached is not None:
+        if return_path or "error" in cached:
+            return cached
+        return cached["image_path"]
+
+    if error is not None:
+        return finalize_result(error, None, cache_key, return_path)
+
+    result, output_path = generate_result(plan, progress)
+
+    return finalize_result(result, output_path, cache_key, return_path)
+
+
+def plan_image(
+    input_image,
+    style=None,
+    mood=None,
+    user_notes=None,
+    user_art_target=None,
+    use_cache=True,
+    request_id=None,
+    use_near_dup=True,
+    progress=None
+):
+    """
+    Everything in process_image up to (not including) the SD call.
+
+    Returns (cache_key, cached, error, plan); exactly one of cached, error
+    and plan is set. The async server runs this in a worker thread and
+    awaits the generation itself.
+    """
+    bind_request_id(request_id)
+    ingested = as_ingested(input_image)
+
+    cache_key, cached = cached_result(
+        ingested, style, mood, user_notes, user_art_target, use_cache
+    )
+
+    if cached is not None:
+        return cache_key, cached, None, None
+
+    error, plan = run_pipeline(
+        ingested,
+        style=style,
+        mood=mood,
+        user_notes=user_notes,
+        user_art_target=user_art_target,
+        use_near_dup=use_near_dup,
+        progress=progress
+    )
+
+    return cache_key, None, error, plan
+
+
+def process_images(
+    input_images,
+    return_path=False,
+    style=None,
+    mood=None,
+    user_notes=None,
+    user_art_target=None,
+    use_cache=True,
+    request_id=None,
+    use_near_dup=True
 ):
+    """
+    Batch version of process_image: YOLO runs over the images in batches
+    and all crops from all images are classified together. Returns one
+    result per input image, in the same order and shape as process_image.
+    """
+    bind_request_id(request_id)
+
+    ingested_images = [as_ingested(img) for img in input_images]
+    outputs = [None] * len(ingested_images)
+    cache_keys = [None] * len(ingested_images)
+    pending = []
+
+    for i, ingested in enumerate(ingested_images):
+        cache_keys[i], cached = cached_result(
+            ingested, style, mood, user_notes, user_art_target, use_cache
+        )
+
+        if cached is None:
+            pending.append(i)
+        elif return_path or "error" in cached:
+            outputs[i] = cached
+        else:
+            outputs[i] = cached["image_path"]
+
+    if not pending:
+        return outputs
+
+    generation_queue = []   # (index, detections, reasoning)
+    near_dup_keys = {}
+
+    if use_near_dup:
+        key = options_key(style, mood, user_notes, user_art_target)
+        still_pending = []
+
+        for i in pending:
+            phash = dhash(ingested_images[i].image)
+            detections, reasoning = reuse_near_duplicate(phash, key)
+
+            if detections is None:
+                near_dup_keys[i] = (phash, key)
+                still_pending.append(i)
+            else:
+                generation_queue.append((i, detections, reasoning))
+
+        pending = still_pending
+
+    logger.info("🔍 Running YOLO Detection on %d image(s)...", len(pending))
+    with admission.slot("cpu"), span("detection"):
+        raw_batches = run_detections([ingested_images[i].image for i in pending])
+
+    # -------------------------------------------------
+    # Filter per image, then classify every crop at once
+    # -------------------------------------------------
+    states = []
+    for i, raw_detections in zip(pending, raw_batches):
+        reasoning = new_reasoning()
+        with span("filtering"):
+            detections, error = filter_detections(raw_detections, reasoning)
+
+        if error:
+            outputs[i] = finalize_result(error, None, cache_keys[i], return_path)
+            continue
+
+        states.append((i, detections, reasoning))
+
+    logger.info("🧪 Running Classification...")
+    all_detections = [det for _, detections, _ in states for det in detections]
+    with admission.slot("cpu"), span("classification"):
+        all_labels, all_sources = classify_detections(all_detections)
+
+    offset = 0
+    for i, detections, reasoning in states:
+        labels = all_labels[offset:offset + len(detections)]
+        sources = all_sources[offset:offset + len(detections)]
+        offset += len(detections)
+
+        error = label_detections(detections, labels, reasoning, sources)
+        if error:
+            outputs[i] = finalize_result(error, None, cache_keys[i], return_path)
+            continue
+
+        if i in near_dup_keys:
+            phash, key = near_dup_keys[i]
+            near_dup_index.add(phash, key, detections, reasoning)
+
+        generation_queue.append((i, detections, reasoning))
+
+    for i, detections, reasoning in sorted(generation_queue, key=lambda x: x[0]):
+        result, output_path = generate_result(prepare_generation(
+            ingested_images[i], detections, reasoning,
+            style=style,
+            mood=mood,
+            user_notes=user_notes,
+            user_art_target=user_art_target
+        ))
+        outputs[i] = finalize_result(result, output_path, cache_keys[i], return_path)
+
+    return outputs
+
+
+def run_pipeline(
+    ingested,
+    style=None,
+    mood=None,
+    user_notes=None,
+    user_art_target=None,
+    use_near_dup=True,
+    progress=None
+):
+    """
+    Detection, filtering, classification and prompt building.
+    Returns (error_result, None) or (None, generation_plan).
+    """
+
+    # -------------------------------
+    # Near-identical earlier upload? Skip straight to the prompt.
+    # -------------------------------
+    if use_near_dup:
+        phash = dhash(ingested.image)
+        key = options_key(style, mood, user_notes, user_art_target)
+        detections, reasoning = reuse_near_duplicate(phash, key)
+
+        if detections is not None:
+            report_detections(progress, detections, reasoning)
+            report_labels(progress, detections, reasoning)
+            return None, prepare_generation(
+                ingested, detections, reasoning,
+                style=style,
+                mood=mood,
+                user_notes=user_notes,
+                user_art_target=user_art_target,
+                progress=progress
+            )
 
     # -------------------------------
     # Reasoning (PER REQUEST)
     # -------------------------------
-    reasoning = {
+    reasoning = new_reasoning()
+
+    logger.info("🔍 Running YOLO Detection...")
+    with admission.slot("cpu"), span("detection"):
+        raw_detections = run_detection(ingested.image)
+
+    with span("filtering"):
+        detections, error = filter_detections(raw_detections, reasoning)
+    if error:
+        return error, None
+    report_detections(progress, detections, reasoning)
+
+    # -------------------------------------------------
+    # Classification
+    # -------------------------------------------------
+    logger.info("🧪 Running Classification...")
+
+    with admission.slot("cpu"), span("classification"):
+        labels, sources = classify_detections(detections)
+        error = label_detections(detections, labels, reasoning, sources)
+    if error:
+        return error, None
+    report_labels(progress, detections, reasoning)
+
+    if use_near_dup:
+        near_dup_index.add(phash, key, detections, reasoning)
+
+    return None, prepare_generation(
+        ingested, detections, reasoning,
+        style=style,
+        mood=mood,
+        user_notes=user_notes,
+        user_art_target=user_art_target,
+        progress=progress
+    )
+
+
+# -------------------------------------------------
+# Pipeline stages
+# -------------------------------------------------
+def bind_request_id(request_id=None):
+    if request_id or current_request_id() == "-":
+        set_request_id(request_id)
+
+
+def new_reasoning():
+    return {
         "raw_detections": 0,
         "accepted_detections": 0,
         "rejected_detections": 0,
         "materials": {},
         "biodegradable": 0,
-        "non_biodegradable": 0
+        "non_biodegradable": 0,
+        "label_sources": {"yolo": 0, "cnn": 0}
     }
 
-    print("\n🔍 Running YOLO Detection...")
-    raw_detections = run_detection(input_image)
+
+def filter_detections(raw_detections, reasoning):
+    """
+    Returns (detections, error_result). error_result is None on success.
+    """
     reasoning["raw_detections"] = len(raw_detections)
 
     if len(raw_detections) == 0:
-        return {
+        return None, {
             "error": "NO_OBJECTS",
             "message": "No detectable objects found in the image."
         }
@@ -62,19 +441,19 @@ def process_image(
     # -------------------------------------------------
     detections = []
 
-    print("\n🧹 Filtering detections...")
+    logger.debug("🧹 Filtering detections...")
     for det in raw_detections:
         cls = det["class"].lower()
         conf = det["conf"]
 
         if conf < CONF_THRESHOLD:
             reasoning["rejected_detections"] += 1
-            print(f"⚠ Ignored low-confidence: {cls} ({conf:.2f})")
+            logger.debug("⚠ Ignored low-confidence: %s (%.2f)", cls, conf)
             continue
 
         if cls not in ALLOWED_WASTE_CLASSES:
             reasoning["rejected_detections"] += 1
-            print(f"⚠ Ignored non-waste class: {cls}")
+            logger.debug("⚠ Ignored non-waste class: %s", cls)
             continue
 
         # Attach bbox for shape-aware prompt logic
@@ -84,114 +463,210 @@ def process_image(
         detections.append(det)
 
     reasoning["accepted_detections"] = len(detections)
+    DETECTIONS.inc(len(detections), outcome="accepted")
+    DETECTIONS.inc(reasoning["rejected_detections"], outcome="rejected")
 
     if len(detections) == 0:
-        return {
+        return None, {
             "error": "NO_OBJECTS",
             "message": "No valid waste objects detected after filtering."
         }
 
-    print(f"\n✅ Accepted {len(detections)} waste object(s):")
-    for det in detections:
-        print(f" - {det['class']} (conf {det['conf']:.2f})")
+    logger.info("✅ Accepted %d waste object(s)", len(detections))
+    if logger.isEnabledFor(logging.DEBUG):
+        for det in detections:
+            logger.debug(" - %s (conf %.2f)", det["class"], det["conf"])
 
     # Sort detections by confidence (strongest first)
     detections.sort(key=lambda x: x["conf"], reverse=True)
 
-    # -------------------------------------------------
-    # Classification
-    # -------------------------------------------------
-    print("\n🧪 Running Classification...")
+    return detections, None
+
+
+def classify_detections(detections):
+    """
+    Returns (labels, sources). Unambiguous, confident YOLO classes are
+    labelled directly; only the rest go through the CNN.
+    """
+    return classify_with_yolo_mapping(
+        [(det["class"], det["crop"], det["conf"]) for det in detections]
+    )
 
-    biodegradable_count = 0
-    non_biodegradable_count = 0
 
-    for det in detections:
-        label = predict_class(det["crop_path"])
+def label_detections(detections, labels, reasoning, sources=None):
+    """
+    Attaches classifier labels and fills the reasoning counters.
+    Returns an error result when nothing recyclable is left.
+    """
+    sources = sources or ["cnn"] * len(detections)
+
+    for det, label, source in zip(detections, labels, sources):
         det["biodeg_label"] = label
+        det["label_source"] = source
+        reasoning["label_sources"][source] += 1
 
         if label == "Biodegradable":
-            biodegradable_count += 1
             reasoning["biodegradable"] += 1
         else:
-            non_biodegradable_count += 1
             reasoning["non_biodegradable"] += 1
 
         material = det["class"]
         reasoning["materials"][material] = reasoning["materials"].get(material, 0) + 1
 
-    print("\n📊 Classification Summary:")
-    print(f"Biodegradable: {biodegradable_count}")
-    print(f"Non-Biodegradable: {non_biodegradable_count}")
+    logger.info(
+        "📊 Classification Summary: Biodegradable %d, Non-Biodegradable %d",
+        reasoning["biodegradable"], reasoning["non_biodegradable"]
+    )
 
-    if non_biodegradable_count == 0:
+    if reasoning["non_biodegradable"] == 0:
         return {
             "error": "NO_RECYCLABLES",
             "message": "Only biodegradable objects detected. No artwork generated."
         }
 
+    return None
+
+
+def report(progress, event, data):
+    if progress is not None:
+        progress(event, data)
+
+
+def report_detections(progress, detections, reasoning):
+    report(progress, "detections", {
+        "detections": [
+            {"class": det["class"], "conf": float(det["conf"]), "bbox": det.get("bbox")}
+            for det in detections
+        ],
+        "rejected": reasoning["rejected_detections"]
+    })
+
+
+def report_labels(progress, detections, reasoning):
+    report(progress, "labels", {
+        "labels": [
+            {"class": det["class"], "label": det["biodeg_label"], "source": det.get("label_source")}
+            for det in detections
+        ],
+        "biodegradable": reasoning["biodegradable"],
+        "non_biodegradable": reasoning["non_biodegradable"]
+    })
+
+
+def prepare_generation(
+    ingested,
+    detections,
+    reasoning,
+    style=None,
+    mood=None,
+    user_notes=None,
+    user_art_target=None,
+    progress=None
+):
+    """
+    Builds the prompt and everything the SD call needs (a "plan").
+    """
     # -------------------------------------------------
     # Prompt generation
     # -------------------------------------------------
-    print("\n📝 Building FINAL PROMPT (backend-authoritative)...")
+    logger.debug("📝 Building FINAL PROMPT (backend-authoritative)...")
+
+    with span("prompt"):
+        prompt_text, negative_prompt = build_prompt(
+            detections=detections,
+            biodegradable_count=reasoning["biodegradable"],
+            non_biodegradable_count=reasoning["non_biodegradable"],
+            style=style,
+            mood=mood,
+            user_notes=user_notes,
+            art_target_override=user_art_target   # optional, can be None
+        )
 
-    prompt_text, negative_prompt = build_prompt(
-        detections=detections,
-        biodegradable_count=biodegradable_count,
-        non_biodegradable_count=non_biodegradable_count,
-        style=style,
-        mood=mood,
-        user_notes=user_notes,
-        art_target_override=user_art_target   # optional, can be None
-        
-    )
 
+    logger.info("FINAL PROMPT: %s", prompt_text)
+    report(progress, "prompt", {"prompt": prompt_text, "negative_prompt": negative_prompt})
 
-    print("\nFINAL PROMPT:")
-    print(prompt_text)
+    # Use img2img only when at least 1 strong object detected
+    use_img2img = reasoning["accepted_detections"] >= 1
 
+    return {
+        "prompt": prompt_text,
+        "negative_prompt": negative_prompt,
+        "output_path": storage.path_for("output", f"{uuid.uuid4().hex}.png"),
+        "init_image": ingested.image if use_img2img else None,
+        "reasoning": reasoning
+    }
+
+
+def generate_result(plan, progress=None):
     # -------------------------------------------------
     # Stable Diffusion Generation
     # -------------------------------------------------
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    OUTPUT_DIR = os.path.join(BASE_DIR, "output")
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    logger.info("🎨 Attempting artwork generation...")
+
+    on_progress = None
+    if progress is not None:
+        on_progress = lambda data: progress("sampling", data)
+
+    try:
+        with admission.slot("sd"), span("generation"):
+            report(progress, "generation", {"status": "started"})
+            generate_art(
+                plan["prompt"],
+                plan["negative_prompt"],
+                plan["output_path"],
+                plan["init_image"],
+                on_progress=on_progress
+            )
+        generation_status = "success"
+    except Exception as e:
+        generation_status = generation_failed(e)
+
+    return complete_generation(plan, generation_status)
 
-    output_path = os.path.join(OUTPUT_DIR, f"{uuid.uuid4().hex}.png")
 
-    print("\n🎨 Attempting artwork generation...")
+async def generate_result_async(plan, client):
+    """generate_result for the async server: the SD call is awaited."""
+    logger.info("🎨 Attempting artwork generation...")
 
     try:
-        # Use img2img only when at least 1 strong object detected
-        use_img2img = reasoning["accepted_detections"] >= 1
-
-        generate_art(
-            prompt_text,
-            negative_prompt,
-            output_path,
-            input_image if use_img2img else None
-        )
+        async with admission.async_slot("sd"):
+            with span("generation"):
+                await generate_art_async(
+                    plan["prompt"],
+                    plan["negative_prompt"],
+                    plan["output_path"],
+                    plan["init_image"],
+                    client=client
+                )
         generation_status = "success"
     except Exception as e:
-        print("⚠ Stable Diffusion unavailable:", str(e))
-        generation_status = "sd_not_available"
+        generation_status = generation_failed(e)
+
+    return complete_generation(plan, generation_status)
+
+
+def generation_failed(e):
+    logger.warning("⚠ Stable Diffusion unavailable: %s", str(e))
+    SD_FAILURES.inc(reason=type(e).__name__)
+    return "sd_not_available"
+
+
+def complete_generation(plan, generation_status):
+    output_path = plan["output_path"]
 
     if generation_status == "success":
-        print("\n✅ DONE! Image saved at:", output_path)
+        logger.info("✅ DONE! Image saved at: %s", output_path)
     else:
-        print("\n⚠ Artwork not generated (Stable Diffusion unavailable)")
+        logger.warning("⚠ Artwork not generated (Stable Diffusion unavailable)")
 
     # -------------------------------------------------
     # RETURN IMAGE + REASONING
     # -------------------------------------------------
-    if return_path:
-        return {
-            "image_path": output_path if generation_status == "success" else None,
-            "generation_status": generation_status,
-            "prompt": prompt_text,
-            "negative_prompt": negative_prompt,
-            "reasoning": reasoning
-        }
-
-
-    return output_path
+    return {
+        "image_path": output_path if generation_status == "success" else None,
+        "generation_status": generation_status,
+        "prompt": plan["prompt"],
+        "negative_prompt": plan["negative_prompt"],
+        "reasoning": plan["reasoning"]
+    }, output_path
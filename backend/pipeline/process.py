@@ -40,9 +40,9 @@ def process_image(input_image):
     # 2) Classify / map to biodegradability
     items_with_labels = []
     for obj in detected:
-        crop = obj["crop_path"]
+        crop = obj["crop"]
         yolo_cls = obj.get("class", "")
-        label, src = infer_with_yolo_mapping(yolo_cls, crop, prefer_yolo=True)
+        label, src = infer_with_yolo_mapping(yolo_cls, crop, prefer_yolo=True, conf=obj.get("conf"))
         items_with_labels.append({**obj, "biodeg_label": label, "label_source": src})
 
     # generate a quick summary for logging
@@ -1,5 +1,10 @@
 import re
 from collections import Counter
+from functools import lru_cache
+
+from telemetry import get_logger
+
+logger = get_logger("prompt")
 
 
 # -------------------------------
@@ -14,15 +19,18 @@ FORBIDDEN_KEYWORDS = [
 
 MAX_USER_TEXT_LEN = 120
 
+# All keywords in one pass (same result as one re.sub per keyword)
+FORBIDDEN_PATTERN = re.compile(
+    r"\b(?:" + "|".join(map(re.escape, FORBIDDEN_KEYWORDS)) + r")\b"
+)
+
 
 def sanitize_user_text(text: str) -> str:
     if not text:
         return ""
 
     text = text.lower().strip()[:MAX_USER_TEXT_LEN]
-
-    for word in FORBIDDEN_KEYWORDS:
-        text = re.sub(rf"\b{word}\b", "", text)
+    text = FORBIDDEN_PATTERN.sub("", text)
 
     return text.strip()
 
@@ -124,6 +132,33 @@ def suggest_art_target(material_counts):
     return "recycled sculpture"
 
 
+# -------------------------------
+# Style & Mood
+# -------------------------------
+
+STYLE_MAP = {
+    "minimal": "minimalist style",
+    "abstract": "abstract artistic interpretation",
+    "modern": "modern contemporary design",
+    "handcrafted": "handcrafted aesthetic"
+}
+
+MOOD_MAP = {
+    "calm": "soft lighting",
+    "hopeful": "uplifting mood",
+    "earthy": "earthy natural tones",
+    "dramatic": "dramatic lighting"
+}
+
+NEGATIVE_PROMPT = (
+    "people, faces, animals, realistic photo, unchanged object, messy composition, "
+    "low quality, blurry, distorted, watermark, text"
+)
+
+# Distinct (materials, orientation, options) signatures kept in memory
+PROMPT_CACHE_SIZE = 4096
+
+
 # -------------------------------
 # Prompt Builder
 # -------------------------------
@@ -138,7 +173,7 @@ def build_prompt(
     user_notes=None,
     art_target_override=None
 ):
-    print(">>> NEW PROMPT BUILDER ACTIVE <<<")
+    logger.debug(">>> NEW PROMPT BUILDER ACTIVE <<<")
 
     # -------------------------------
     # Collect recyclable objects
@@ -153,6 +188,34 @@ def build_prompt(
         raise ValueError("No recyclable materials found")
 
     counts = Counter(materials)
+
+    # -------------------------------
+    # Shape orientation (per detection list)
+    # -------------------------------
+    orientation_hint = extract_orientation_hint(detections)
+
+    # Everything below depends only on this signature, so it is memoized.
+    # Counter keeps first-seen order, which the material phrase relies on.
+    return compose_prompt(
+        tuple(counts.items()),
+        orientation_hint,
+        style,
+        mood,
+        sanitize_user_text(user_notes),
+        art_target_override
+    )
+
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def compose_prompt(
+    material_counts,
+    orientation_hint,
+    style,
+    mood,
+    user_hint,
+    art_target_override
+):
+    counts = dict(material_counts)
     total_objects = sum(counts.values())
 
     # -------------------------------
@@ -181,8 +244,6 @@ def build_prompt(
     # -------------------------------
     # Shape + texture grounding
     # -------------------------------
-    orientation_hint = extract_orientation_hint(detections)
-
     shape_hints = [
         OBJECT_SHAPE_MAP[m]
         for m in counts.keys()
@@ -223,23 +284,8 @@ def build_prompt(
     # -------------------------------
     # Style & Mood
     # -------------------------------
-    STYLE_MAP = {
-        "minimal": "minimalist style",
-        "abstract": "abstract artistic interpretation",
-        "modern": "modern contemporary design",
-        "handcrafted": "handcrafted aesthetic"
-    }
-
-    MOOD_MAP = {
-        "calm": "soft lighting",
-        "hopeful": "uplifting mood",
-        "earthy": "earthy natural tones",
-        "dramatic": "dramatic lighting"
-    }
-
     style_text = STYLE_MAP.get(style, "")
     mood_text = MOOD_MAP.get(mood, "")
-    user_hint = sanitize_user_text(user_notes)
 
     # -------------------------------
     # Final Prompt
@@ -254,12 +300,4 @@ def build_prompt(
         ] if p
     )
 
-    # -------------------------------
-    # Negative Prompt
-    # -------------------------------
-    negative_prompt = (
-        "people, faces, animals, realistic photo, unchanged object, messy composition, "
-        "low quality, blurry, distorted, watermark, text"
-    )
-
-    return final_prompt, negative_prompt
+    return final_prompt, NEGATIVE_PROMPT
@@ -1,6 +1,10 @@
-from backend.embedding.embed import get_text_embedding
+import threading
+from functools import lru_cache
+
 import numpy as np
 
+from embedding.embed import get_text_embedding, get_text_embeddings
+
 STYLE_TEMPLATES = [
     "highly detailed eco-art sculpture made from recycled materials",
     "creative upcycled artwork with artistic transformation of waste",
@@ -14,7 +18,54 @@ NEGATIVE_PROMPT = (
     "text, watermark, logo, noisy background, artificial colors, extra limbs, bad composition"
 )
 
-def create_prompt(detections, bio_count, nonbio_count):
+# Distinct material descriptions whose embeddings are kept in memory
+DESCRIPTION_CACHE_SIZE = 1024
+
+
+class StyleIndex:
+    """
+    Template embeddings encoded once, L2-normalized and stacked into a
+    matrix, so picking the closest template is a single matrix product.
+    """
+
+    def __init__(self, templates):
+        self.templates = list(templates)
+        self.matrix = get_text_embeddings(self.templates, normalize=True)
+
+    def best(self, vector):
+        scores = self.matrix @ vector
+        return self.templates[int(np.argmax(scores))]
+
+
+_default_index = None
+_index_lock = threading.Lock()
+
+
+def get_style_index():
+    global _default_index
+    if _default_index is None:
+        with _index_lock:
+            if _default_index is None:
+                _default_index = StyleIndex(STYLE_TEMPLATES)
+    return _default_index
+
+
+@lru_cache(maxsize=DESCRIPTION_CACHE_SIZE)
+def embed_description(description):
+    vector = np.asarray(get_text_embedding(description), dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    vector = vector / norm if norm else vector
+    vector.setflags(write=False)   # shared between callers via the cache
+    return vector
+
+
+def select_style(description, index=None):
+    """Returns the template most cosine-similar to the description."""
+    index = index or get_style_index()
+    return index.best(embed_description(description))
+
+
+def create_prompt(detections, bio_count, nonbio_count, style_index=None):
     # Extract UNIQUE objects only
     unique_objects = sorted(list({det["class"] for det in detections}))
     object_list = ", ".join(unique_objects)
@@ -25,12 +76,8 @@ def create_prompt(detections, bio_count, nonbio_count):
         f"These waste items are creatively transformed into artistic forms. "
     )
 
-    # SBERT selects best style template
-    embeddings = [get_text_embedding(t) for t in STYLE_TEMPLATES]
-    base_vector = get_text_embedding(material_description)
-
-    similarities = [np.dot(base_vector, e) for e in embeddings]
-    best_style = STYLE_TEMPLATES[int(np.argmax(similarities))]
+    # SBERT selects best style template (pass a StyleIndex for a custom library)
+    best_style = select_style(material_description, style_index)
 
     # FINAL prompt
     final_prompt = (
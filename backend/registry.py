@@ -0,0 +1,99 @@
+import threading
+import time
+
+from telemetry import get_logger, MODEL_LOAD_SECONDS
+
+logger = get_logger("registry")
+
+
+class ModelRegistry:
+    """
+    Central place where heavy models are loaded.
+
+    Models are registered with a loader function and only loaded on first
+    use (or by a background warm-up), so importing the pipeline stays cheap.
+    """
+
+    def __init__(self):
+        self.loaders = {}
+        self.models = {}
+        self.state = {}
+        self.lock = threading.Lock()
+
+    def register(self, name, loader):
+        with self.lock:
+            self.loaders[name] = loader
+            self.state.setdefault(name, {
+                "status": "not_loaded",
+                "load_seconds": None,
+                "error": None,
+                "lock": threading.Lock()
+            })
+
+    def get(self, name):
+        model = self.models.get(name)
+        if model is not None:
+            return model
+
+        if name not in self.loaders:
+            raise KeyError(f"Unknown model: {name}")
+
+        state = self.state[name]
+        with state["lock"]:
+            # Another thread may have finished loading while we waited
+            if name in self.models:
+                return self.models[name]
+
+            logger.info("⏳ Loading model '%s'...", name)
+            state["status"] = "loading"
+            start = time.perf_counter()
+
+            try:
+                model = self.loaders[name]()
+            except Exception as e:
+                state["status"] = "failed"
+                state["error"] = str(e)
+                logger.error("❌ Failed to load model '%s': %s", name, str(e))
+                raise
+
+            state["load_seconds"] = time.perf_counter() - start
+            state["status"] = "ready"
+            state["error"] = None
+            self.models[name] = model
+
+            MODEL_LOAD_SECONDS.set(state["load_seconds"], model=name)
+            logger.info("✅ Model '%s' ready in %.2fs", name, state["load_seconds"])
+            return model
+
+    def warm_up(self, names, background=True):
+        def _load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    pass   # recorded in state, reported by status()
+
+        if not background:
+            _load_all()
+            return None
+
+        thread = threading.Thread(target=_load_all, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def is_ready(self, names):
+        return all(self.state.get(n, {}).get("status") == "ready" for n in names)
+
+    def status(self):
+        with self.lock:
+            return {
+                name: {
+                    "status": s["status"],
+                    "load_seconds": s["load_seconds"],
+                    "error": s["error"]
+                }
+                for name, s in self.state.items()
+            }
+
+
+registry = ModelRegistry()
@@ -1,4 +1,4 @@
-import sys, os, uuid
+import sys, os
 
 # -----------------------------
 # Path setup
@@ -7,19 +7,72 @@ PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(PROJECT_ROOT)
 sys.path.append(PROJECT_ROOT)
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, g, Response
 from flask_cors import CORS
-from pipeline import process_image
+from pipeline import process_image, process_images, result_cache, response_payload
+from jobs import JobManager
+from sse import stream_events
+from registry import registry
+from storage import storage
+from serving import (
+    WARMUP_MODELS, ImageRequestError, ingest_upload, read_options,
+    image_request, image_file, cache_image_response
+)
+from admission import admission, AdmissionRejected
+from generation import generate_art
+from telemetry import get_logger, set_request_id, render_metrics
+
+logger = get_logger("server")
 
 app = Flask(__name__)
 CORS(app)
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))   # backend/
-UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
-OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+# Every image of a batch is decoded into memory before processing starts.
+# Each also takes a pending slot, so keep this below admission.MAX_PENDING
+MAX_BATCH_IMAGES = 8
+
+# Background size / age eviction for uploads, output and crops
+storage.start_janitor()
+
+# Take failing SD backends out of rotation and bring them back on recovery
+generate_art.sd_client.start_health_checks()
+
+job_manager = JobManager()
+
+# Loaded in the background so the server starts accepting connections immediately
+registry.warm_up(WARMUP_MODELS)
+
+
+# -----------------------------
+# Request ids (propagated to the pipeline and echoed back)
+# -----------------------------
+@app.before_request
+def bind_request_id():
+    g.request_id = set_request_id(request.headers.get("X-Request-ID"))
+
 
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+@app.after_request
+def add_request_id_header(response):
+    if "request_id" in g:
+        response.headers["X-Request-ID"] = g.request_id
+    return response
+
+
+# -----------------------------
+# Backpressure: fast 429 instead of queueing without bound
+# -----------------------------
+@app.errorhandler(AdmissionRejected)
+def admission_rejected(e):
+    response = jsonify({"error": "BUSY", "reason": e.reason, "retry_after": e.retry_after})
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response, 429
+
+
+# -----------------------------
+# Request helpers
+# -----------------------------
+def client_id():
+    return request.remote_addr
 
 
 # -----------------------------
@@ -30,46 +83,161 @@ def process():
     if "image" not in request.files:
         return jsonify({"error": "No image provided"}), 400
 
-    file = request.files["image"]
-    save_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}.jpg")
-    file.save(save_path)
+    with admission.admit(client_id()):
+        try:
+            ingested = ingest_upload(request.files["image"].read())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # -------- Read inputs from UI --------
+        options = read_options(request.form)
 
-    # -------- Read inputs from UI --------
-    style = request.form.get("style")
-    mood = request.form.get("mood")
-    user_notes = request.form.get("notes")
-    user_art_target = request.form.get("art_target")   # NEW (Hybrid override)
+        try:
+            result = process_image(ingested, return_path=True, request_id=g.request_id, **options)
+            return jsonify(response_payload(result)), 200
+
+        except Exception as e:
+            logger.exception("❌ SERVER ERROR: %s", str(e))
+            return jsonify({"error": str(e)}), 500
+
+
+# -----------------------------
+# Streaming variant: Server-Sent Events per stage, then the result
+# -----------------------------
+@app.route("/process/stream", methods=["POST"])
+def process_stream():
+    if "image" not in request.files:
+        return jsonify({"error": "No image provided"}), 400
 
     try:
-        result = process_image(
-            save_path,
-            return_path=True,
-            style=style,
-            mood=mood,
-            user_notes=user_notes,
-            user_art_target=user_art_target   # Pass to pipeline
-        )
-
-        # -----------------------------
-        # Handle pipeline error cases
-        # -----------------------------
-        if isinstance(result, dict) and "error" in result:
-            return jsonify(result), 200
-
-        # -----------------------------
-        # Success response
-        # -----------------------------
-        return jsonify({
-            "image_path": result.get("image_path"),
-            "generation_status": result.get("generation_status"),
-            "prompt": result.get("prompt"),
-            "negative_prompt": result.get("negative_prompt"),
-            "reasoning": result.get("reasoning")
-        }), 200
-
-    except Exception as e:
-        print("❌ SERVER ERROR:", str(e))
-        return jsonify({"error": str(e)}), 500
+        ingested = ingest_upload(request.files["image"].read())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    options = read_options(request.form)
+
+    # Counts against the pending limit until the pipeline finishes; the
+    # stream's worker starts now, so this holds even if nobody reads it
+    run = admission.admitted(process_image, client_id())
+
+    events = stream_events(run, ingested, return_path=True, request_id=g.request_id, **options)
+    return Response(events, mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+# -----------------------------
+# Multi-image batch endpoint
+# -----------------------------
+@app.route("/process/batch", methods=["POST"])
+def process_batch():
+    files = request.files.getlist("images") or request.files.getlist("image")
+    if not files:
+        return jsonify({"error": "No images provided"}), 400
+    if len(files) > MAX_BATCH_IMAGES:
+        return jsonify({"error": f"At most {MAX_BATCH_IMAGES} images per batch"}), 413
+
+    # One pending slot per image, taken before any of them is decoded
+    with admission.admit(client_id(), units=len(files)):
+        try:
+            ingested_images = [ingest_upload(f.read()) for f in files]
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        options = read_options(request.form)
+
+        try:
+            results = process_images(ingested_images, return_path=True, request_id=g.request_id, **options)
+            return jsonify({"results": [response_payload(r) for r in results]}), 200
+
+        except Exception as e:
+            logger.exception("❌ SERVER ERROR: %s", str(e))
+            return jsonify({"error": str(e)}), 500
+
+
+# -----------------------------
+# Job-based processing (non-blocking)
+# -----------------------------
+@app.route("/jobs", methods=["POST"])
+def create_job():
+    if "image" not in request.files:
+        return jsonify({"error": "No image provided"}), 400
+
+    try:
+        ingested = ingest_upload(request.files["image"].read())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    options = read_options(request.form)
+
+    # The job counts against the pending limit until its worker finishes
+    job_id = job_manager.submit(
+        admission.admitted(process_image, client_id()),
+        ingested, return_path=True, request_id=g.request_id, **options
+    )
+    return jsonify({"job_id": job_id, "status": "queued"}), 202
+
+
+@app.route("/jobs/<job_id>")
+def get_job(job_id):
+    job = job_manager.get(job_id)
+
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    response = {"job_id": job_id, "status": job["status"]}
+
+    if job["status"] == "done":
+        response["result"] = response_payload(job["result"])
+    elif job["status"] == "failed":
+        response["error"] = job["error"]
+
+    return jsonify(response), 200
+
+
+# -----------------------------
+# Result cache statistics
+# -----------------------------
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify(result_cache.stats()), 200
+
+
+# -----------------------------
+# Admission control (queue depth, slots, rejections)
+# -----------------------------
+@app.route("/admission/stats")
+def admission_stats():
+    return jsonify(admission.stats()), 200
+
+
+# -----------------------------
+# Prometheus metrics
+# -----------------------------
+@app.route("/metrics")
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+# -----------------------------
+# Health / readiness
+# -----------------------------
+@app.route("/healthz")
+def healthz():
+    return jsonify({"status": "ok", "models": registry.status()}), 200
+
+
+@app.route("/sd/backends")
+def sd_backends():
+    return jsonify({"backends": generate_art.sd_client.stats()}), 200
+
+
+@app.route("/readyz")
+def readyz():
+    ready = registry.is_ready(WARMUP_MODELS)
+    body = {"ready": ready, "models": registry.status()}
+    return jsonify(body), 200 if ready else 503
 
 
 # -----------------------------
@@ -77,12 +245,14 @@ def process():
 # -----------------------------
 @app.route("/image/<filename>")
 def get_image(filename):
-    image_path = os.path.join(OUTPUT_DIR, filename)
-
-    if not os.path.exists(image_path):
-        return jsonify({"error": "Image not found"}), 404
+    """Parameters and caching: serving.image_request / image_file."""
+    try:
+        image_path, width, fmt, negotiated = image_request(filename, request.args, request.headers)
+    except ImageRequestError as e:
+        return jsonify({"error": str(e)}), e.status
 
-    return send_file(image_path, mimetype="image/png")
+    path, options = image_file(image_path, width, fmt)
+    return cache_image_response(send_file(path, **options), negotiated)
 
 
 # -----------------------------
@@ -0,0 +1,191 @@
+"""
+Async (ASGI) serving mode.
+
+Same /process and /image/<filename> contract as server.py, but the
+Stable Diffusion round-trip is awaited on a non-blocking HTTP client and
+CPU-bound work (decode, YOLO, CNN, prompt) runs on a small thread pool.
+One process can hold hundreds of in-flight generations this way.
+
+    cd backend && hypercorn server_async:app --bind 127.0.0.1:5000
+"""
+import sys, os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# -----------------------------
+# Path setup
+# -----------------------------
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BACKEND_DIR)
+
+from quart import Quart, request, jsonify, send_file, g, Response
+from quart_cors import cors
+from pipeline import plan_image, generate_result_async, finalize_result, response_payload
+from registry import registry
+from storage import storage
+from serving import (
+    WARMUP_MODELS, ImageRequestError, ingest_upload, read_options,
+    image_request, image_file, cache_image_response
+)
+from admission import admission, AdmissionRejected
+from generation import generate_art
+from generation.sd_async import AsyncSDClient
+from telemetry import get_logger, set_request_id, render_metrics
+
+logger = get_logger("server_async")
+
+app = cors(Quart(__name__))
+
+# Threads for CPU-bound stages; SD waits do not occupy any of them
+CPU_WORKERS = 4
+
+# Waiting on SD costs no thread here, so allow far more than the threaded
+# server's admission.SD_SLOTS (the backends queue what they can't run)
+SD_SLOTS = 32
+MAX_PENDING = 64
+
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="pipeline-cpu")
+admission.configure(max_pending=MAX_PENDING, sd=SD_SLOTS)
+sd_async_client = AsyncSDClient(generate_art.sd_client)
+
+
+async def run_cpu(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, functools.partial(fn, *args, **kwargs))
+
+
+# -----------------------------
+# Lifecycle
+# -----------------------------
+@app.before_serving
+async def start_background_work():
+    registry.warm_up(WARMUP_MODELS)
+    storage.start_janitor()
+    generate_art.sd_client.start_health_checks()
+
+
+@app.after_serving
+async def stop_background_work():
+    await sd_async_client.close()
+    cpu_executor.shutdown(wait=False)
+
+
+# -----------------------------
+# Request ids (propagated to the pipeline and echoed back)
+# -----------------------------
+@app.before_request
+async def bind_request_id():
+    g.request_id = set_request_id(request.headers.get("X-Request-ID"))
+
+
+@app.after_request
+async def add_request_id_header(response):
+    if "request_id" in g:
+        response.headers["X-Request-ID"] = g.request_id
+    return response
+
+
+# -----------------------------
+# Backpressure: fast 429 instead of queueing without bound
+# -----------------------------
+@app.errorhandler(AdmissionRejected)
+async def admission_rejected(e):
+    response = jsonify({"error": "BUSY", "reason": e.reason, "retry_after": e.retry_after})
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response, 429
+
+
+# -----------------------------
+# Request helpers
+# -----------------------------
+def client_id():
+    return request.remote_addr
+
+
+# -----------------------------
+# Main processing endpoint
+# -----------------------------
+@app.route("/process", methods=["POST"])
+async def process():
+    files = await request.files
+    if "image" not in files:
+        return jsonify({"error": "No image provided"}), 400
+
+    form = await request.form
+    options = read_options(form)
+
+    with admission.admit(client_id()):
+        try:
+            ingested = await run_cpu(ingest_upload, files["image"].read())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            cache_key, cached, error, plan = await run_cpu(
+                plan_image, ingested, request_id=g.request_id, **options
+            )
+
+            if cached is not None:
+                result = cached
+            elif error is not None:
+                result = finalize_result(error, None, cache_key, True)
+            else:
+                result, output_path = await generate_result_async(plan, sd_async_client)
+                result = await asyncio.to_thread(finalize_result, result, output_path, cache_key, True)
+
+            return jsonify(response_payload(result)), 200
+
+        except Exception as e:
+            logger.exception("❌ SERVER ERROR: %s", str(e))
+            return jsonify({"error": str(e)}), 500
+
+
+# -----------------------------
+# Admission control (queue depth, slots, rejections)
+# -----------------------------
+@app.route("/admission/stats")
+async def admission_stats():
+    return jsonify(admission.stats()), 200
+
+
+# -----------------------------
+# Prometheus metrics / health
+# -----------------------------
+@app.route("/metrics")
+async def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/healthz")
+async def healthz():
+    return jsonify({"status": "ok", "models": registry.status()}), 200
+
+
+@app.route("/readyz")
+async def readyz():
+    ready = registry.is_ready(WARMUP_MODELS)
+    body = {"ready": ready, "models": registry.status()}
+    return jsonify(body), 200 if ready else 503
+
+
+# -----------------------------
+# Image serving endpoint
+# -----------------------------
+@app.route("/image/<filename>")
+async def get_image(filename):
+    """Same query parameters and caching as server.py:get_image."""
+    try:
+        image_path, width, fmt, negotiated = image_request(filename, request.args, request.headers)
+    except ImageRequestError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    path, options = await asyncio.to_thread(image_file, image_path, width, fmt)
+    return cache_image_response(await send_file(path, **options), negotiated)
+
+
+# -----------------------------
+# App runner
+# -----------------------------
+if __name__ == "__main__":
+    app.run(port=5000)
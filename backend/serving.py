@@ -0,0 +1,96 @@
+"""
+Settings and request helpers shared by both serving modes (server.py and
+server_async.py), so the two cannot drift apart.
+"""
+import os
+import uuid
+
+from ingest import ingest_bytes
+from storage import storage
+from derivatives import parse_variant, derivative_path, image_etag
+
+
+# -----------------------------
+# Serving settings
+# -----------------------------
+# Uploads are decoded in memory; keep a copy on disk only when enabled
+PERSIST_UPLOADS = False
+
+# Output names are random and never rewritten, so clients may cache for good
+IMAGE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Models the pipeline needs; loaded in the background so the server
+# starts accepting connections immediately.
+WARMUP_MODELS = ["yolo", "classifier"]
+
+
+# -----------------------------
+# Request helpers
+# -----------------------------
+def ingest_upload(data):
+    """Decodes uploaded bytes; raises ValueError for unreadable images."""
+    ingested = ingest_bytes(data)
+    if PERSIST_UPLOADS:
+        ingested.persist(storage.path_for("uploads", f"{uuid.uuid4().hex}.jpg"))
+    return ingested
+
+
+def read_options(form):
+    return {
+        "style": form.get("style"),
+        "mood": form.get("mood"),
+        "user_notes": form.get("notes"),
+        "user_art_target": form.get("art_target")   # NEW (Hybrid override)
+    }
+
+
+# -----------------------------
+# /image/<filename>
+# -----------------------------
+class ImageRequestError(Exception):
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def image_request(filename, args, headers):
+    """
+    ?w=256|512|1024 for a downscaled copy, ?format=png|jpeg|webp|avif|auto
+    (auto picks from the Accept header). Returns (image_path, width, fmt,
+    negotiated); raises ImageRequestError (404 / 400).
+    """
+    image_path = storage.resolve("output", filename)
+
+    if image_path is None:
+        raise ImageRequestError("Image not found", 404)
+
+    try:
+        width, fmt, negotiated = parse_variant(args.get("w"), args.get("format"), headers.get("Accept"))
+    except ValueError as e:
+        raise ImageRequestError(str(e), 400)
+
+    return image_path, width, fmt, negotiated
+
+
+def image_file(image_path, width, fmt):
+    """
+    Creates the variant if needed. Returns (path, send_file keyword
+    arguments) for a conditional (If-None-Match / If-Modified-Since) reply.
+    """
+    path, mimetype = derivative_path(image_path, width, fmt)
+    return path, {
+        "mimetype": mimetype,
+        "conditional": True,
+        "etag": image_etag(image_path, width, fmt),
+        "last_modified": os.path.getmtime(image_path),
+        "max_age": IMAGE_MAX_AGE
+    }
+
+
+def cache_image_response(response, negotiated):
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    if negotiated:
+        response.vary.add("Accept")
+    return response
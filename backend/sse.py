@@ -0,0 +1,60 @@
+import json
+import queue
+import threading
+
+from pipeline import response_payload
+from telemetry import get_logger
+
+logger = get_logger("sse")
+
+
+# -------------------------------
+# Stream settings
+# -------------------------------
+KEEPALIVE_SECONDS = 15   # comment line so proxies don't drop a quiet stream
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_events(run, *args, **kwargs):
+    """
+    Runs run(*args, progress=..., **kwargs) on a worker thread and yields
+    its progress callbacks as Server-Sent Events. The last event is
+    "result" (the usual /process payload) or "error".
+
+    The worker starts right away, not when the response is first read:
+    it keeps running (and releases whatever run holds) even if the client
+    disconnects before the stream starts.
+    """
+    events = queue.Queue()
+
+    def progress(event, data):
+        events.put((event, data))
+
+    def worker():
+        try:
+            result = run(*args, progress=progress, **kwargs)
+            events.put(("result", response_payload(result)))
+        except Exception as e:
+            logger.exception("❌ STREAM ERROR: %s", str(e))
+            events.put(("error", {"error": str(e)}))
+        finally:
+            events.put(None)
+
+    threading.Thread(target=worker, name="pipeline-stream", daemon=True).start()
+    return drain(events)
+
+
+def drain(events):
+    while True:
+        try:
+            item = events.get(timeout=KEEPALIVE_SECONDS)
+        except queue.Empty:
+            yield ": keep-alive\n\n"
+            continue
+
+        if item is None:
+            return
+        yield format_event(*item)
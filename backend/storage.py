@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+
+from telemetry import get_logger, counter
+
+logger = get_logger("storage")
+
+
+# -------------------------------
+# Storage layout
+# -------------------------------
+# Every generated / uploaded file lives under one root, so paths no longer
+# depend on the working directory the server was started from.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))   # backend/
+STORAGE_ROOT = os.environ.get("WASTETOART_STORAGE_ROOT", BASE_DIR)
+
+GB = 1024 ** 3
+DAY = 24 * 60 * 60
+
+AREAS = {
+    "uploads": {"dir": "uploads", "max_bytes": 2 * GB, "max_age": 7 * DAY},
+    "output": {"dir": "output", "max_bytes": 10 * GB, "max_age": 30 * DAY},
+    "crops": {"dir": os.path.join("detection", "crops"), "max_bytes": GB // 2, "max_age": 1 * DAY},
+    # Resized / re-encoded copies of output images (see derivatives.py)
+    "derivatives": {"dir": os.path.join("cache", "derivatives"), "max_bytes": 2 * GB, "max_age": 30 * DAY},
+}
+
+# Files go into <area>/<ab>/<cd>/<name>, using the leading hex characters
+# of their (uuid) names, so no single directory grows without bound.
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+
+EVICTION_INTERVAL = 10 * 60   # seconds between background sweeps
+
+EVICTIONS = counter(
+    "wastetoart_storage_evictions_total", "Files removed by the storage manager", ["area", "reason"]
+)
+
+
+class StorageManager:
+
+    def __init__(self, root=STORAGE_ROOT, areas=AREAS):
+        self.root = root
+        self.areas = areas
+        self.janitor = None
+        self.stop_event = threading.Event()
+
+        for area in self.areas:
+            os.makedirs(self.area_dir(area), exist_ok=True)
+
+    # -------------------------------
+    # Paths
+    # -------------------------------
+    def area_dir(self, area):
+        return os.path.join(self.root, self.areas[area]["dir"])
+
+    def shard(self, filename):
+        stem = os.path.splitext(filename)[0]
+        return [
+            stem[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH]
+            for i in range(SHARD_DEPTH)
+            if len(stem) >= (i + 1) * SHARD_WIDTH
+        ]
+
+    def path_for(self, area, filename):
+        """Sharded path for a new file (parent directories are created)."""
+        directory = os.path.join(self.area_dir(area), *self.shard(filename))
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, filename)
+
+    def resolve(self, area, filename):
+        """
+        Finds an existing file by name, or returns None.
+        Falls back to the flat pre-sharding layout for older files.
+        """
+        filename = os.path.basename(filename)
+        if not filename:
+            return None
+
+        sharded = os.path.join(self.area_dir(area), *self.shard(filename), filename)
+        if os.path.isfile(sharded):
+            return sharded
+
+        legacy = os.path.join(self.area_dir(area), filename)
+        if os.path.isfile(legacy):
+            return legacy
+
+        return None
+
+    # -------------------------------
+    # Eviction
+    # -------------------------------
+    def enforce_limits(self, area, now=None):
+        """Drops files past max_age, then the oldest ones until under max_bytes."""
+        limits = self.areas[area]
+        now = now or time.time()
+
+        files = []
+        for dirpath, _, names in os.walk(self.area_dir(area)):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+
+        for mtime, size, path in files:
+            expired = limits.get("max_age") and now - mtime > limits["max_age"]
+            oversize = limits.get("max_bytes") and total > limits["max_bytes"]
+            if not (expired or oversize):
+                break
+
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+
+            total -= size
+            removed += 1
+            EVICTIONS.inc(area=area, reason="age" if expired else "size")
+
+        if removed:
+            logger.info("🧹 Evicted %d file(s) from %s", removed, area)
+        return removed
+
+    def sweep(self):
+        for area in self.areas:
+            try:
+                self.enforce_limits(area)
+            except Exception as e:
+                logger.error("Storage sweep failed for %s: %s", area, str(e))
+
+    def start_janitor(self, interval=EVICTION_INTERVAL):
+        if self.janitor is not None:
+            return self.janitor
+
+        def _loop():
+            while not self.stop_event.is_set():
+                self.sweep()
+                self.stop_event.wait(interval)
+
+        self.janitor = threading.Thread(target=_loop, name="storage-janitor", daemon=True)
+        self.janitor.start()
+        return self.janitor
+
+    def stop_janitor(self):
+        self.stop_event.set()
+
+
+storage = StorageManager()
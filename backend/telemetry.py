@@ -0,0 +1,248 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+
+# -------------------------------
+# Logging
+# -------------------------------
+# DEBUG shows per-detection detail; WARNING keeps the hot path quiet.
+LOG_LEVEL = os.environ.get("WASTETOART_LOG_LEVEL", "INFO").upper()
+
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+def _configure_root():
+    root = logging.getLogger("wastetoart")
+    if root.handlers:
+        return root
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(
+        "%(asctime)s %(levelname)-7s [%(request_id)s] %(name)s: %(message)s"
+    ))
+    handler.addFilter(RequestIdFilter())
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+    return root
+
+
+_configure_root()
+
+
+def get_logger(name):
+    return logging.getLogger(f"wastetoart.{name}")
+
+
+# -------------------------------
+# Request ids
+# -------------------------------
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+def set_request_id(request_id=None):
+    """Binds a request id to the current context and returns it."""
+    request_id = request_id or new_request_id()
+    request_id_var.set(request_id)
+    return request_id
+
+
+def current_request_id():
+    return request_id_var.get()
+
+
+# -------------------------------
+# Metrics (Prometheus text format)
+# -------------------------------
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 180)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    inner = ",".join(f'{k}="{str(v)}"' for k, v in pairs)
+    return "{" + inner + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self.lock:
+            self.values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self.series = {}   # label values -> [bucket counts, sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        with self.lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self.series.items())
+
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total!r}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+_metrics = []
+
+
+def _register(metric):
+    _metrics.append(metric)
+    return metric
+
+
+def counter(name, documentation, labelnames=()):
+    return _register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=()):
+    return _register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram(name, documentation, labelnames, buckets))
+
+
+def render_metrics():
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------------
+# Pipeline metrics
+# -------------------------------
+STAGE_SECONDS = histogram(
+    "wastetoart_stage_seconds", "Time spent in each pipeline stage", ["stage"]
+)
+MODEL_SECONDS = histogram(
+    "wastetoart_model_seconds", "Time spent in each model call", ["model"]
+)
+DETECTIONS = counter(
+    "wastetoart_detections_total", "Detections by filtering outcome", ["outcome"]
+)
+CLASSIFIER_BATCH_SIZE = histogram(
+    "wastetoart_classifier_batch_size", "Crops per classifier predict call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+LABEL_SOURCES = counter(
+    "wastetoart_labels_total", "Biodegradability labels by source (yolo fast path or cnn)", ["source"]
+)
+SD_FAILURES = counter(
+    "wastetoart_sd_failures_total", "Failed Stable Diffusion generations", ["reason"]
+)
+MODEL_LOAD_SECONDS = gauge(
+    "wastetoart_model_load_seconds", "Time taken to load each model", ["model"]
+)
+REQUESTS = counter(
+    "wastetoart_requests_total", "Pipeline requests by outcome", ["outcome"]
+)
+
+
+# -------------------------------
+# Timing spans
+# -------------------------------
+_span_logger = get_logger("span")
+
+
+@contextmanager
+def timed(metric, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric.observe(time.perf_counter() - start, **labels)
+
+
+@contextmanager
+def span(stage):
+    """Times one pipeline stage and logs it against the current request id."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        _span_logger.debug("stage=%s duration_ms=%.1f", stage, elapsed * 1000.0)